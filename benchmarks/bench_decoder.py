@@ -0,0 +1,312 @@
+"""
+ImageDecoder 性能基准
+用法:
+    python benchmarks/bench_decoder.py run [--sizes 0.25 1 4] [--images RGB L] [-o result.json]
+    python benchmarks/bench_decoder.py compare 旧结果.json 新结果.json [--threshold 0.1]
+
+对合成的 RGB/RGBA/L 图像测量各阶段的耗时、吞吐量（MP/s）和峰值内存：
+计时不启用 tracemalloc；RSS 为各项在独立子进程中运行时的峰值增量，
+结果写入JSON，compare 命令报告超过阈值的性能回退
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, PngImagePlugin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import ImageDecoder, DecryptionParams  # noqa: E402
+
+DEFAULT_SIZES = (0.25, 1, 4, 16, 100)
+DEFAULT_IMAGES = ('RGB', 'RGBA', 'L')
+
+# 每种解密方法使用的参数
+DECRYPT_CASES = {
+    'decrypt_default_mode': DecryptionParams(mode='default', mode_type='dark', boundary=100, brightness=55),
+    'decrypt_simple_lsb': DecryptionParams(mode='simple_lsb', bits=3),
+    'decrypt_channel_lsb': DecryptionParams(mode='channel_lsb', channel_bits={'R': 2, 'G': 3, 'B': 4}),
+    'decrypt_smart_lsb': DecryptionParams(mode='smart_lsb', bit_range={'min': 1, 'max': 5}, threshold=0.5),
+    'decrypt_adaptive': DecryptionParams(mode='adaptive', selected_strategy='simple_lsb',
+                                         strategy_params={'bits': 2, 'strength': 1.0}),
+}
+
+
+def synthetic_image(mode: str, megapixels: float, seed: int = 0) -> Image.Image:
+    """生成带渐变和噪声的合成图像（接近真实图像的压缩特性）"""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(seed)
+    yy = np.arange(height, dtype=np.uint16)[:, None]
+    xx = np.arange(width, dtype=np.uint16)[None, :]
+    base = ((xx * 7 // max(1, width // 36) + yy * 5 // max(1, height // 51)) % 256).astype(np.uint8)
+    channels = len(mode)
+    planes = [base + rng.integers(0, 8, base.shape, dtype=np.uint8) for _ in range(channels)]
+    array = planes[0] if channels == 1 else np.stack(planes, axis=-1)
+    return Image.fromarray(array)
+
+
+def _save_with_metadata(image: Image.Image, path: str, params: DecryptionParams):
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Steganography_mode', params.mode)
+    info.add_text('Steganography_parameters', json.dumps({
+        'selected_strategy': params.selected_strategy,
+        'strategy_params': params.strategy_params,
+    }))
+    image.save(path, pnginfo=info, compress_level=1)
+
+
+def _status_mb(field: str) -> Optional[float]:
+    """/proc/self/status 中的内存字段（MB），非 Linux 平台返回 None"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """将进程的峰值RSS（VmHWM）重置为当前RSS（Linux 4.0+）"""
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """进程峰值RSS（MB）"""
+    peak = _status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _operations(decoder: ImageDecoder, path: str, tmp: str, workers: int, resident: str):
+    """各测量项 [(名称, 函数)]；save_png 需要先执行一次解密"""
+    def load():
+        decoder.load_image(path, resident=resident)
+        decoder.encrypted_image.load()
+
+    ops = [('load_image', load),
+           ('auto_detect_params', decoder.auto_detect_params)]
+    for name, params in DECRYPT_CASES.items():
+        ops.append((name, lambda p=params: decoder.decrypt(p, workers=workers)))
+    ops.append(('save_png', lambda: decoder.decrypted_image.save(os.path.join(tmp, 'out.png'))))
+    return ops
+
+
+def _measure(func, repeat: int):
+    """
+    运行 repeat 次，返回 (耗时中位数, tracemalloc峰值MB)
+    计时时不启用 tracemalloc，tracemalloc 峰值另外运行一次测量
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), traced_peak / (1024 * 1024)
+
+
+def measure_rss(path: str, op: str, workers: int = 1, resident: str = 'lazy') -> Optional[float]:
+    """
+    在新启动的进程中测量单项操作的峰值RSS增量（MB）
+    先完成准备（载入图像；save_png 另需一次解密），以此时的RSS为基线：
+    Linux 上将峰值重置为当前RSS；其他平台以准备阶段的峰值为基线，准备阶段峰值更高时结果偏小
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        decoder = ImageDecoder()
+        ops = dict(_operations(decoder, path, tmp, workers, resident))
+        with contextlib.redirect_stdout(io.StringIO()):
+            if op != 'load_image':
+                ops['load_image']()
+            if op == 'save_png':
+                ops['decrypt_adaptive']()
+        gc.collect()
+        baseline = _status_mb('VmRSS') if _reset_peak_rss() else _peak_rss_mb()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ops[op]()
+        peak = _peak_rss_mb()
+    if baseline is None or peak is None:
+        return None
+    return max(0.0, peak - baseline)
+
+
+def _measure_rss_subprocess(path: str, op: str, workers: int, resident: str) -> Optional[float]:
+    """在子进程中运行 measure_rss（各项互不影响，不受之前测量项的峰值影响）"""
+    command = [sys.executable, os.path.abspath(__file__), 'rss', path, op,
+               '--workers', str(workers), '--resident', resident]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        return float(output.split()[-1])
+    except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+        return None
+
+
+def run_benchmarks(sizes, images, repeat: int = 3, progress=print, workers: int = 1,
+                   resident: str = 'lazy', rss: bool = True):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in images:
+            for megapixels in sizes:
+                image = synthetic_image(mode, megapixels)
+                actual_mp = image.width * image.height / 1e6
+                path = os.path.join(tmp, f'{mode}_{megapixels}.png')
+                _save_with_metadata(image, path, DECRYPT_CASES['decrypt_adaptive'])
+
+                decoder = ImageDecoder()
+                ops = _operations(decoder, path, tmp, workers, resident)
+                ops[0][1]()
+                source = decoder.encrypted_image
+                for op, func in ops:
+                    if op != 'load_image':
+                        # 每项测量前恢复原图（load_image 的测量会替换图像对象）
+                        decoder.encrypted_image = source
+                    seconds, traced_mb = _measure(func, repeat)
+                    rss_mb = _measure_rss_subprocess(path, op, workers, resident) if rss else None
+                    record = {
+                        'image': mode,
+                        'megapixels': round(actual_mp, 3),
+                        'size': megapixels,
+                        'op': op,
+                        'workers': workers,
+                        'resident': resident,
+                        'seconds': seconds,
+                        'mp_per_s': actual_mp / seconds if seconds > 0 else None,
+                        'tracemalloc_peak_mb': round(traced_mb, 2),
+                        'rss_delta_mb': round(rss_mb, 2) if rss_mb is not None else None,
+                    }
+                    results.append(record)
+                    if progress:
+                        mp_s = f"{record['mp_per_s']:.1f}" if record['mp_per_s'] else '-'
+                        rss_text = f"{rss_mb:.1f}" if rss_mb is not None else '-'
+                        progress(f"{mode:5s} {megapixels:>6} MP  {op:22s} {seconds * 1000:10.2f} ms  "
+                                 f"{mp_s:>8} MP/s  {traced_mb:8.1f} MB  RSS +{rss_text:>7} MB")
+                os.remove(path)
+    return results
+
+
+def environment() -> dict:
+    import PIL
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def _compare_key(record: Dict) -> Tuple:
+    """对比时的匹配键：线程数和常驻模式不同的结果不可比（缺少字段的旧结果按默认值）"""
+    return (record['image'], record['size'], record['op'],
+            record.get('workers', 1), record.get('resident', 'lazy'))
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """对比两次结果（按 图像、大小、操作、线程数、常驻模式 匹配），耗时增加超过 threshold（比例）视为回退"""
+    with open(old_path, encoding='utf-8') as f:
+        old = {_compare_key(r): r for r in json.load(f)['results']}
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)['results']
+
+    regressions = 0
+    unmatched = 0
+    print(f"{'image':5s} {'size':>6s}  {'op':22s} {'workers':>7s} {'resident':>8s} "
+          f"{'old ms':>10s} {'new ms':>10s} {'change':>8s}")
+    for record in new:
+        key = _compare_key(record)
+        if key not in old:
+            unmatched += 1
+            continue
+        before, after = old[key]['seconds'], record['seconds']
+        change = (after - before) / before if before > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  << 回退'
+            regressions += 1
+        print(f"{key[0]:5s} {key[1]:>6} MP {key[2]:22s} {key[3]:>7} {key[4]:>8s} "
+              f"{before * 1000:10.2f} {after * 1000:10.2f} "
+              f"{change:+8.1%}{flag}")
+    if unmatched:
+        print(f"\n{unmatched} 项在旧结果中没有相同的配置，未对比")
+    print(f"\n{regressions} 项回退（阈值 {threshold:.0%}）")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='ImageDecoder 性能基准')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='运行基准测试')
+    run.add_argument('--sizes', type=float, nargs='+', default=list(DEFAULT_SIZES),
+                     help='图像大小（百万像素）')
+    run.add_argument('--images', nargs='+', default=list(DEFAULT_IMAGES), choices=DEFAULT_IMAGES)
+    run.add_argument('--repeat', type=int, default=3, help='每项重复次数（取中位数）')
+    run.add_argument('--workers', type=int, default=1, help='decrypt() 的线程数（0为全部核心）')
+    run.add_argument('--resident', choices=('eager', 'lazy', 'off'), default='lazy',
+                     help='load_image 的常驻源数据模式（off 为每次解密重新读取像素）')
+    run.add_argument('--no-rss', action='store_true', help='不在子进程中测量各项的峰值RSS增量')
+    run.add_argument('-o', '--output', default='bench_results.json', help='结果JSON文件')
+
+    rss_parser = sub.add_parser('rss', help='测量单项操作的峰值RSS增量（由 run 在子进程中调用）')
+    rss_parser.add_argument('path')
+    rss_parser.add_argument('op')
+    rss_parser.add_argument('--workers', type=int, default=1)
+    rss_parser.add_argument('--resident', choices=('eager', 'lazy', 'off'), default='lazy')
+
+    cmp_parser = sub.add_parser('compare', help='对比两次结果')
+    cmp_parser.add_argument('old')
+    cmp_parser.add_argument('new')
+    cmp_parser.add_argument('--threshold', type=float, default=0.10, help='回退阈值（默认0.10即10%%）')
+
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        return compare(args.old, args.new, args.threshold)
+    if args.command == 'rss':
+        print(measure_rss(args.path, args.op, args.workers, args.resident))
+        return 0
+
+    results = run_benchmarks(args.sizes, args.images, args.repeat, workers=args.workers,
+                             resident=args.resident, rss=not args.no_rss)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, ensure_ascii=False)
+    print(f"结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# 使 pytest 在仓库根目录下可以直接导入 core 包
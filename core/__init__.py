@@ -1,5 +1,6 @@
 
 from .decoder import ImageDecoder
 from .params import DecryptionParams
+from .result_cache import ResultCache
 
-__all__ = ['ImageDecoder', 'DecryptionParams']
\ No newline at end of file
+__all__ = ['ImageDecoder', 'DecryptionParams', 'ResultCache']
\ No newline at end of file
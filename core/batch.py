@@ -0,0 +1,479 @@
+"""
+无界面批量解密
+用法: python -m core.batch 输入目录 输出目录 [--jobs N] [--params JSON] [--trace 事件文件]
+                           [--format png|tiff|npy|webp] [--compress-level 0-9]
+                           [--pipeline 读取,解密,写出线程数]
+
+默认先探测全部文件的元数据，按规范化参数（解密计划）分组，
+再将同组文件成块分发给工作进程，使各进程的计划和查找表缓存保持命中；
+工作进程内由后台写出线程保存结果，写出与下一个文件的解密重叠。
+--pipeline 改为单进程的读取/解密/写出三段流水线（见 core.pipeline）；
+--journal 记录断点日志，中断后可继续，再次运行时跳过未变化的文件（见 core.journal）
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import math
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .decoder import ImageDecoder
+from .instrument import JsonLinesSink, NULL_SINK, StatsSink, read_jsonl
+from .journal import BatchJournal
+from .params import DecryptionParams
+from .plans import compile_plan, plan_cache_stats, plan_label
+from .saving import (AsyncSaver, SaveOptions, DEFAULT_SAVE_OPTIONS, SAVE_FORMATS,
+                     PNG_STRATEGIES, save_format, save_image)
+from .streaming import decrypt_streaming
+
+# 与GUI导入对话框一致的图像类型
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# 分组模式下单个任务块的最大文件数（兼顾负载均衡和进度反馈）
+MAX_CHUNK = 32
+
+# (源文件, 输出文件, 参数字典或None)
+GroupItem = Tuple[str, str, Optional[Dict]]
+
+
+@dataclass
+class FileResult:
+    """单个文件的解密结果"""
+    source: str
+    output: Optional[str] = None
+    mode: Optional[str] = None
+    megapixels: float = 0.0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    group: Optional[str] = None     # 所属参数分组（解密计划标识）
+    plan_hits: int = 0              # 解密本文件时计划缓存的命中次数（compile_plan 计数增量）
+    plan_misses: int = 0            # 解密本文件时新编译计划的次数
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def plan_reused(self) -> bool:
+        """解密计划全部取自本进程的计划缓存（没有重新编译）"""
+        return self.plan_hits > 0 and self.plan_misses == 0
+
+
+def params_from_dict(data: Dict) -> DecryptionParams:
+    """从字典构造解密参数（忽略未知字段）"""
+    if 'mode' not in data:
+        raise ValueError("手动参数缺少 mode 字段")
+    names = {f.name for f in fields(DecryptionParams)}
+    return DecryptionParams(**{k: v for k, v in data.items() if k in names})
+
+
+def iter_images(input_dir: str) -> Iterator[str]:
+    """递归遍历目录中的图像文件（按路径排序）"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def output_path_for(source: str, input_dir: str, output_dir: str, extension: str = '.png') -> str:
+    """保持相对目录结构，输出统一为同一格式（默认PNG）"""
+    rel = os.path.relpath(source, input_dir)
+    return os.path.join(output_dir, os.path.splitext(rel)[0] + extension)
+
+
+def batch_tasks(input_dir: str, output_dir: str,
+                options: SaveOptions = DEFAULT_SAVE_OPTIONS) -> List[Tuple[str, str]]:
+    """目录中的全部 (源文件, 输出文件)；格式决定输出扩展名"""
+    extension = SAVE_FORMATS[options.format or 'png']
+    return [(src, output_path_for(src, input_dir, output_dir, extension))
+            for src in iter_images(input_dir)]
+
+
+def resolve_params(decoder: ImageDecoder, manual_params: Optional[Dict] = None,
+                   search: bool = False) -> DecryptionParams:
+    """
+    文件的解密参数：手动参数优先，其次为元数据；
+    search 为True时无元数据的文件使用暴力搜索的最佳参数
+    """
+    if manual_params:
+        return params_from_dict(manual_params)
+    params = decoder.auto_detect_params()
+    if params is None and search:
+        candidates = decoder.search_params(top_k=1, workers=1)
+        params = candidates[0] if candidates else None
+    if params is None:
+        raise ValueError("无法从元数据获取解密参数")
+    return params
+
+
+def job_settings(manual_params: Optional[Dict] = None, search: bool = False,
+                 options: SaveOptions = DEFAULT_SAVE_OPTIONS) -> Dict:
+    """
+    影响输出的任务设置（断点日志据此判断已处理的文件能否跳过）
+    手动参数按解密计划规范化；使用元数据参数时参数随文件内容变化，由内容摘要覆盖
+    """
+    return {
+        'params': plan_label(compile_plan(params_from_dict(manual_params))) if manual_params else None,
+        'search': search,
+        'save': asdict(options),
+    }
+
+
+def output_form(output: str, options: SaveOptions = DEFAULT_SAVE_OPTIONS) -> str:
+    """解密结果的返回形式：.npy 直接写出数组，省去构造PIL图像"""
+    return 'array' if save_format(output, options) == 'npy' else 'image'
+
+
+def decode_file(source: str, output: str, manual_params: Optional[Dict] = None,
+                verbose: bool = False, strip_height: Optional[int] = None,
+                search: bool = False, trace: Optional[str] = None,
+                options: SaveOptions = DEFAULT_SAVE_OPTIONS,
+                saver: Optional[AsyncSaver] = None) -> FileResult:
+    """
+    解密单个文件（在工作进程中运行，异常不会向外传播）
+    指定 strip_height 时按条带流式解密，不在内存中保留完整图像；
+    search 为True时，无元数据的文件使用暴力搜索的最佳参数；
+    trace 为插桩事件文件（JSON-lines，多进程追加写入）；
+    options 为写出选项；指定 saver 时交给后台写出线程保存后立即返回，
+    写出完成（saver.close()）后结果中的 output/error/seconds 才是最终值
+    """
+    result = FileResult(source=source)
+    start = time.perf_counter()
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    sink = JsonLinesSink(trace) if trace else NULL_SINK
+
+    def finish(error: Optional[Exception] = None):
+        if error is not None:
+            result.error = f"{type(error).__name__}: {error}"
+        else:
+            result.output = output
+        result.seconds = time.perf_counter() - start
+        sink.event('file', mode=result.mode, path=source, seconds=result.seconds,
+                   megapixels=result.megapixels, error=result.error)
+        sink.close()
+
+    plans = plan_cache_stats()
+    try:
+        with log:
+            decoder = ImageDecoder(sink=sink)
+            if not decoder.load_image(source):
+                raise IOError("无法加载图像")
+            width, height = decoder.encrypted_image.size
+            result.megapixels = width * height / 1e6
+
+            params = resolve_params(decoder, manual_params, search)
+            result.mode = params.mode
+
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            if strip_height:
+                decrypt_streaming(source, output, params, strip_height,
+                                  options.compress_level, sink=sink)
+                _count_plans(result, plans)
+            else:
+                image = decoder.decrypt(params, output=output_form(output, options))
+                _count_plans(result, plans)
+                if image is None:
+                    raise ValueError(f"解密失败（模式: {params.mode}）")
+                if saver is not None:
+                    saver.submit(image, output, options, sink, params.mode,
+                                 callback=lambda future: finish(future.exception()))
+                    return result
+                save_image(image, output, options, sink, params.mode)
+    except Exception as e:
+        finish(e)
+        return result
+    finish()
+    return result
+
+
+def _count_plans(result: FileResult, before: Dict[str, int]):
+    """记录解密本文件期间计划缓存的命中/编译次数（写出在后台进行，因此解密后立即读取）"""
+    after = plan_cache_stats()
+    result.plan_hits = after['hits'] - before['hits']
+    result.plan_misses = after['misses'] - before['misses']
+
+
+def group_by_plan(tasks: List[Tuple[str, str]], manual_params: Optional[Dict] = None,
+                  probe_workers: int = 8) -> Dict[str, List[GroupItem]]:
+    """
+    按规范化参数分组
+    只读取元数据文本块（不解码像素）；参数不同但解密计划相同的文件
+    （如同位数的 simple_lsb 与 smart_lsb）归入同一组，无元数据的文件归入 'none'
+    """
+    from .probe import probe_many
+
+    if manual_params:
+        label = plan_label(compile_plan(params_from_dict(manual_params)))
+        return {label: [(src, dst, manual_params) for src, dst in tasks]}
+
+    groups: Dict[str, List[GroupItem]] = defaultdict(list)
+    probed = probe_many([src for src, _ in tasks], workers=probe_workers)
+    for (src, dst), (_, params) in zip(tasks, probed):
+        plan = compile_plan(params) if params is not None else None
+        groups[plan_label(plan)].append((src, dst, asdict(params) if params is not None else None))
+    return dict(groups)
+
+
+def decode_group(items: List[GroupItem], group: str, verbose: bool = False,
+                 strip_height: Optional[int] = None, search: bool = False,
+                 trace: Optional[str] = None,
+                 options: SaveOptions = DEFAULT_SAVE_OPTIONS) -> List[FileResult]:
+    """
+    在同一工作进程中依次解密一组参数相同的文件
+    非流式解密时由后台写出线程保存，写出与下一个文件的解密重叠；
+    组内文件的解密计划相同，第一个文件编译后其余文件命中本进程的计划缓存
+    （各文件实际的命中/编译次数见 FileResult.plan_hits/plan_misses）
+    """
+    results = []
+    saver = AsyncSaver(options) if not strip_height else None
+    try:
+        for src, dst, params in items:
+            result = decode_file(src, dst, params, verbose, strip_height, search, trace,
+                                 options, saver)
+            result.group = group
+            results.append(result)
+    finally:
+        if saver is not None:
+            saver.close()
+    return results
+
+
+def _chunks(groups: Dict[str, List[GroupItem]], jobs: int) -> List[Tuple[str, List[GroupItem]]]:
+    """将各组切成任务块：大组优先，每组至多切成 jobs 块以利用全部进程"""
+    chunks = []
+    for group, items in sorted(groups.items(), key=lambda kv: len(kv[1]), reverse=True):
+        size = max(1, min(MAX_CHUNK, math.ceil(len(items) / max(1, jobs))))
+        chunks += [(group, items[i:i + size]) for i in range(0, len(items), size)]
+    return chunks
+
+
+def run_batch(input_dir: str, output_dir: str, jobs: int = 1,
+              manual_params: Optional[Dict] = None, verbose: bool = False,
+              progress=None, strip_height: Optional[int] = None,
+              search: bool = False, trace: Optional[str] = None,
+              group: bool = True,
+              options: SaveOptions = DEFAULT_SAVE_OPTIONS,
+              tasks: Optional[List[Tuple[str, str]]] = None) -> Tuple[List[FileResult], float]:
+    """
+    批量解密目录中的所有图像
+    group 为True时先按参数分组，再按组分块分发（见 group_by_plan）；
+    options 为写出选项（格式决定输出扩展名）；
+    tasks 指定时只处理这些 (源文件, 输出文件)（如断点日志筛选后的待处理文件）
+    返回 (结果列表, 总耗时秒数)
+    """
+    if tasks is None:
+        tasks = batch_tasks(input_dir, output_dir, options)
+    results: List[FileResult] = []
+    start = time.perf_counter()
+
+    if group:
+        chunks = _chunks(group_by_plan(tasks, manual_params), jobs)
+        args = (verbose, strip_height, search, trace, options)
+        if jobs <= 1:
+            for name, items in chunks:
+                for result in decode_group(items, name, *args):
+                    results.append(result)
+                    if progress:
+                        progress(result)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(decode_group, items, name, *args): (name, items)
+                           for name, items in chunks}
+                for future in as_completed(futures):
+                    name, items = futures[future]
+                    try:
+                        chunk_results = future.result()
+                    except Exception as e:
+                        # 工作进程崩溃等情况，只影响当前任务块
+                        chunk_results = [FileResult(source=src, group=name,
+                                                    error=f"{type(e).__name__}: {e}")
+                                         for src, _, _ in items]
+                    for result in chunk_results:
+                        results.append(result)
+                        if progress:
+                            progress(result)
+    elif jobs <= 1:
+        for src, dst in tasks:
+            result = decode_file(src, dst, manual_params, verbose, strip_height, search, trace,
+                                 options)
+            results.append(result)
+            if progress:
+                progress(result)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(decode_file, src, dst, manual_params, verbose, strip_height,
+                                   search, trace, options): src
+                       for src, dst in tasks}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程崩溃等情况，只影响当前文件
+                    result = FileResult(source=futures[future], error=f"{type(e).__name__}: {e}")
+                results.append(result)
+                if progress:
+                    progress(result)
+
+    return results, time.perf_counter() - start
+
+
+def format_summary(results: List[FileResult], elapsed: float) -> str:
+    """生成批量处理汇总"""
+    ok = [r for r in results if r.ok]
+    failed = len(results) - len(ok)
+    megapixels = sum(r.megapixels for r in ok)
+    elapsed = max(elapsed, 1e-9)
+    return (f"完成: {len(ok)} 成功, {failed} 失败, 共 {len(results)} 个文件\n"
+            f"耗时: {elapsed:.2f}s, {len(ok) / elapsed:.2f} 文件/秒, "
+            f"{megapixels / elapsed:.2f} MP/秒")
+
+
+def format_groups(results: List[FileResult]) -> str:
+    """按参数分组的吞吐量和计划缓存命中情况（工作进程中实测）"""
+    groups: Dict[str, List[FileResult]] = defaultdict(list)
+    for result in results:
+        groups[result.group or 'none'].append(result)
+
+    reused = sum(r.plan_reused for r in results)
+    hits = sum(r.plan_hits for r in results)
+    misses = sum(r.plan_misses for r in results)
+    lines = [f"参数分组: {len(groups)} 组, 命中计划缓存 {reused}/{len(results)} 个文件 "
+             f"(缓存命中 {hits} 次, 编译 {misses} 次)"]
+    for name, members in sorted(groups.items(), key=lambda kv: len(kv[1]), reverse=True):
+        ok = [r for r in members if r.ok]
+        seconds = max(sum(r.seconds for r in members), 1e-9)
+        megapixels = sum(r.megapixels for r in ok)
+        lines.append(f"  {name:20s} {len(members):5d} 文件 ({len(ok)} 成功)  "
+                     f"{len(members) / seconds:8.2f} 文件/秒  {megapixels / seconds:8.2f} MP/秒  "
+                     f"命中缓存 {sum(r.plan_reused for r in members)}")
+    return '\n'.join(lines)
+
+
+def _load_manual_params(value: Optional[str]) -> Optional[Dict]:
+    """--params 可以是JSON字符串或JSON文件路径"""
+    if not value:
+        return None
+    if os.path.isfile(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    else:
+        data = json.loads(value)
+    params_from_dict(data)  # 提前校验
+    return data
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m core.batch',
+        description='批量解密目录中的隐写图像（无界面）')
+    parser.add_argument('input_dir', help='输入目录（递归遍历）')
+    parser.add_argument('output_dir', help='输出目录（保持相对路径，输出格式见 --format）')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='工作进程数（默认: CPU核心数）')
+    parser.add_argument('-p', '--params',
+                        help='手动参数，覆盖元数据。JSON字符串或文件，'
+                             '例如 \'{"mode": "simple_lsb", "bits": 3}\'')
+    parser.add_argument('--strip-height', type=int, default=None,
+                        help='按指定行数分条流式解密（用于超大图像）')
+    parser.add_argument('--format', choices=sorted(SAVE_FORMATS), default='png',
+                        help='输出格式：png、无压缩tiff、原始npy数组或无损webp（默认: png）')
+    parser.add_argument('--compress-level', type=int, choices=range(10), default=6,
+                        metavar='0-9', help='PNG压缩级别，1 比默认的 6 快数倍（默认: 6）')
+    parser.add_argument('--png-strategy', choices=sorted(PNG_STRATEGIES), default='default',
+                        help='PNG的zlib压缩策略（默认: default）')
+    parser.add_argument('--search', action='store_true',
+                        help='无元数据时暴力搜索参数并使用评分最高的一组')
+    parser.add_argument('--no-group', action='store_true',
+                        help='不按参数分组，逐个文件分发（旧行为）')
+    parser.add_argument('--pipeline', metavar='R,D,W',
+                        help='使用读取/解密/写出三段流水线（单进程多线程，忽略 --jobs），'
+                             '指定各段线程数，例如 2,1,2；结束后输出各段的利用率和队列统计')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='流水线相邻两段之间的队列容量（帧数，默认: 4）')
+    parser.add_argument('--journal', metavar='FILE',
+                        help='断点日志（只追加的JSON-lines）：中断后用同一日志继续，'
+                             '再次运行时跳过内容和参数都未变化的文件')
+    parser.add_argument('--processes', action='store_true',
+                        help='流水线的解密段使用工作进程（数量为 D），像素经共享内存块传递')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='将各阶段的耗时事件写入JSON-lines文件，结束后输出 p50/p95 汇总')
+    parser.add_argument('-v', '--verbose', action='store_true', help='输出解密器调试信息')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if not os.path.isdir(args.input_dir):
+        print(f"输入目录不存在: {args.input_dir}", file=sys.stderr)
+        return 2
+    try:
+        manual_params = _load_manual_params(args.params)
+    except (ValueError, TypeError) as e:
+        print(f"手动参数无效: {e}", file=sys.stderr)
+        return 2
+
+    journal = None
+
+    def progress(result: FileResult):
+        if journal is not None:
+            journal.record(result)
+        if result.ok:
+            print(f"[OK] {result.source} -> {result.output} ({result.seconds:.2f}s)")
+        else:
+            print(f"[失败] {result.source}: {result.error}", file=sys.stderr)
+
+    if args.strip_height and args.format not in ('png', 'npy'):
+        print("流式解密只支持 png/npy 输出", file=sys.stderr)
+        return 2
+    pipeline = None
+    if args.pipeline:
+        from .pipeline import PipelineConfig, run_pipeline, format_stage_stats
+        if args.strip_height:
+            print("流水线不支持流式解密（--strip-height）", file=sys.stderr)
+            return 2
+        try:
+            pipeline = PipelineConfig.parse(args.pipeline, args.queue_size, args.processes)
+        except ValueError as e:
+            print(f"流水线参数无效: {e}", file=sys.stderr)
+            return 2
+    if args.trace:
+        open(args.trace, 'w').close()
+
+    options = SaveOptions(args.format, args.compress_level, args.png_strategy)
+    tasks = batch_tasks(args.input_dir, args.output_dir, options)
+    if args.journal:
+        journal = BatchJournal(args.journal, job_settings(manual_params, args.search, options))
+        tasks, skipped = journal.pending(tasks)
+        print(f"断点日志: 跳过 {len(skipped)} 个未变化的文件, 待处理 {len(tasks)} 个")
+    try:
+        if pipeline is not None:
+            results, stages, elapsed = run_pipeline(tasks, pipeline, manual_params, args.verbose,
+                                                    progress, args.search, args.trace, options)
+            print(format_summary(results, elapsed))
+            print(format_stage_stats(stages, elapsed))
+        else:
+            results, elapsed = run_batch(args.input_dir, args.output_dir, args.jobs,
+                                         manual_params, args.verbose, progress, args.strip_height,
+                                         args.search, args.trace, not args.no_group, options,
+                                         tasks)
+            print(format_summary(results, elapsed))
+            if not args.no_group:
+                print(format_groups(results))
+    finally:
+        if journal is not None:
+            journal.close()
+    if args.trace:
+        print(StatsSink.from_events(read_jsonl(args.trace)).format_table(by_mode=True))
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
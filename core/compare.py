@@ -0,0 +1,69 @@
+"""
+参数对比缩略图
+在同一幅代理图上并行解密一组常用参数（simple_lsb 1-8位、常见通道组合、
+默认模式分界点扫描），生成缩略图供人工比较和挑选
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from .params import DecryptionParams
+
+# 对比的参数空间
+COMPARE_LSB_BITS = tuple(range(1, 9))
+COMPARE_CHANNEL_BITS = ((1, 1, 2), (2, 2, 2), (2, 3, 4), (3, 3, 3), (3, 4, 5), (4, 4, 4))
+COMPARE_BOUNDARIES = (64, 96, 128, 160, 192)
+
+THUMB_SIZE = (160, 160)
+
+
+def comparison_candidates() -> List[DecryptionParams]:
+    """对比网格中的全部参数（按显示顺序）"""
+    candidates = [DecryptionParams(mode='simple_lsb', bits=b) for b in COMPARE_LSB_BITS]
+    candidates += [DecryptionParams(mode='channel_lsb', channel_bits={'R': r, 'G': g, 'B': b})
+                   for r, g, b in COMPARE_CHANNEL_BITS]
+    candidates += [DecryptionParams(mode='default', mode_type=mode_type, boundary=k)
+                   for mode_type in ('light', 'dark') for k in COMPARE_BOUNDARIES]
+    return candidates
+
+
+def comparison_label(params: DecryptionParams) -> str:
+    """缩略图下方的简短说明"""
+    if params.mode == 'simple_lsb':
+        return f"LSB {params.bits} bits"
+    if params.mode == 'channel_lsb':
+        bits = params.channel_bits
+        return f"RGB {bits['R']}/{bits['G']}/{bits['B']}"
+    if params.mode == 'default':
+        return f"{'亮色' if params.mode_type == 'light' else '暗色'} k={params.boundary}"
+    return params.mode
+
+
+def render_comparison(proxy, candidates: Optional[Sequence[DecryptionParams]] = None,
+                      workers: Optional[int] = None) -> List[Tuple[DecryptionParams, Image.Image]]:
+    """
+    在代理解密器（ImageDecoder.make_proxy 的结果）上并行解密全部候选
+    各线程使用独立的解密器，共享代理图及其只读的常驻源数据；
+    解密失败的候选不出现在结果中
+    """
+    from .decoder import ImageDecoder
+
+    if candidates is None:
+        candidates = comparison_candidates()
+    if proxy.encrypted_image is None:
+        return []
+    cache = proxy.build_resident_source()
+
+    def decode(params: DecryptionParams) -> Optional[Image.Image]:
+        decoder = ImageDecoder()
+        decoder.encrypted_image = proxy.encrypted_image
+        decoder.resident_source = cache
+        return decoder.decrypt(params)
+
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        thumbs = list(pool.map(decode, candidates))
+    return [(params, thumb) for params, thumb in zip(candidates, thumbs) if thumb is not None]
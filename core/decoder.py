@@ -4,52 +4,267 @@
 
 from PIL import Image, PngImagePlugin
 import numpy as np
+import functools
 import json
-from typing import Optional, Dict
+import os
+from typing import Optional, Dict, List, Tuple
 from .params import DecryptionParams
+from .lut import MAX_LSB_BITS, apply_banded, source_depth
+from .plans import (DecodePlan, compile_plan, adaptive_plan,
+                    lsb_plan, channel_plan, smart_plan, default_plan,
+                    normalize_channel_bits, normalize_bit_range)
+from .streaming import decrypt_streaming
+from .search import search_params
+from .resident import ResidentSource, NATIVE_MODES, ALPHA_MODES, decode_source
+from .deep_png import is_deep_color_png, read_deep_color_png
+from .result_cache import ResultCache, image_digest
+from .instrument import (Sink, default_sink, STAGE_OPEN, STAGE_METADATA, STAGE_MATERIALIZE,
+                         STAGE_CONVERT, STAGE_TRANSFORM, STAGE_WRAP)
+
+# 常驻源数据模式：eager 加载时即读取像素；lazy 首次解密时读取；
+# off 每次解密重新读取（只解密一次的场景可省去常驻内存）
+RESIDENT_MODES = ('eager', 'lazy', 'off')
+
+
+def _nearest_indices(size: int, new_size: int) -> np.ndarray:
+    """PIL 最近邻缩放时各输出位置对应的源索引（对索引序列做同样的缩放得到）"""
+    ramp = Image.fromarray(np.arange(size, dtype=np.int32)[np.newaxis])
+    return np.asarray(ramp.resize((new_size, 1), Image.Resampling.NEAREST))[0].astype(np.intp)
+
 
 class ImageDecoder:
     """图像解密核心类 - 优化版 v3.0"""
     
-    def __init__(self):
+    def __init__(self, result_cache: Optional[ResultCache] = None, sink: Optional[Sink] = None):
         self.encrypted_image = None
         self.decrypted_image = None
         self.metadata = {}
+        self.filepath = None
+        self.resident_source = None
+        # 可选的解密结果缓存（可在多个解密器间共享）
+        self.result_cache = result_cache
+        self._digest = None   # (图像对象, 内容摘要)
+        self._deep = False    # 是否为16位彩色PNG（像素由 deep_png 另行读取）
+        self._output = 'image'   # 解密结果的返回形式
+        # 插桩事件接收器（默认为进程内默认接收器，通常是NullSink）
+        self.sink = sink if sink is not None else default_sink()
+        self._trace_mode = None   # 当前解密模式，附在各阶段事件上
+        self._workers = 1   # 变换使用的线程数
+        # 常驻源数据模式（见 RESIDENT_MODES）：像素只读取和规范化一次，之后各次解密共用
+        self.resident = 'lazy'
         
-    def load_image(self, filepath: str) -> bool:
-        """加载加密图像 - 优化元数据读取"""
+    def load_image(self, filepath: str, resident: str = 'lazy') -> bool:
+        """
+        加载加密图像 - 优化元数据读取
+        resident 为常驻源数据模式：'eager' 立即读取像素并建立只读源数据，
+        'lazy' 在首次解密时建立，'off' 不常驻
+        """
+        if resident not in RESIDENT_MODES:
+            raise ValueError(f"未知的常驻模式: {resident}")
+        self.unload()
+        self.resident = resident
         try:
-            self.encrypted_image = Image.open(filepath)
+            with self.sink.stage(STAGE_OPEN, path=filepath) as span:
+                self.encrypted_image = Image.open(filepath)
+                if self.sink.enabled and isinstance(filepath, str):
+                    span.nbytes = os.path.getsize(filepath)
+            self.filepath = filepath
             
             # 尝试读取PNG元数据
             if isinstance(self.encrypted_image, PngImagePlugin.PngImageFile):
-                self.metadata = {}
-                
-                # 读取模式
-                if 'Steganography_mode' in self.encrypted_image.info:
-                    self.metadata['mode'] = self.encrypted_image.info['Steganography_mode']
-                
-                # 读取参数（JSON格式）
-                if 'Steganography_parameters' in self.encrypted_image.info:
-                    try:
-                        params_json = self.encrypted_image.info['Steganography_parameters']
-                        self.metadata['parameters'] = json.loads(params_json)
-                    except json.JSONDecodeError as e:
-                        print(f"JSON解析错误: {e}")
-                        self.metadata['parameters'] = {}
-                
-                # 读取其他信息
-                if 'Software' in self.encrypted_image.info:
-                    self.metadata['software'] = self.encrypted_image.info['Software']
-                    
-                # 调试输出
-                print(f"加载的元数据: {self.metadata}")
+                with self.sink.stage(STAGE_METADATA):
+                    self.metadata = self.parse_metadata(self.encrypted_image.info)
+                self.sink.event('metadata_loaded', metadata=self.metadata)
+                # PIL 只能读出16位彩色PNG的高8位
+                self._deep = (self.encrypted_image.mode in ('RGB', 'RGBA')
+                              and is_deep_color_png(filepath))
             
+            if resident == 'eager':
+                self.build_resident_source()
             return True
         except Exception as e:
             print(f"加载图像失败: {e}")
             return False
     
+    @staticmethod
+    def parse_metadata(info: Dict[str, str]) -> Dict:
+        """从PNG文本块中提取隐写元数据"""
+        metadata = {}
+        
+        # 读取模式
+        if 'Steganography_mode' in info:
+            metadata['mode'] = info['Steganography_mode']
+        
+        # 读取参数（JSON格式）
+        if 'Steganography_parameters' in info:
+            try:
+                metadata['parameters'] = json.loads(info['Steganography_parameters'])
+            except json.JSONDecodeError as e:
+                print(f"JSON解析错误: {e}")
+                metadata['parameters'] = {}
+        
+        # 读取其他信息
+        if 'Software' in info:
+            metadata['software'] = info['Software']
+            
+        return metadata
+    
+    def build_resident_source(self) -> Optional[ResidentSource]:
+        """
+        为当前图像建立常驻的只读源数据
+        之后的各模式解密直接在其上查表，无需重新读取像素
+        """
+        if self.encrypted_image is None:
+            return None
+        if self.resident_source is None or not self.resident_source.matches(self.encrypted_image):
+            self.resident_source = None
+            self.resident_source = ResidentSource(self.encrypted_image,
+                                                self._read_pixels(self.encrypted_image))
+        return self.resident_source
+    
+    def clear_resident_source(self):
+        """释放常驻源数据"""
+        self.resident_source = None
+    
+    def unload(self):
+        """释放当前图像、常驻源数据和解密结果（其他地方不再引用时内存即被回收）"""
+        self.encrypted_image = None
+        self.decrypted_image = None
+        self.resident_source = None
+        self.metadata = {}
+        self.filepath = None
+        self._digest = None
+        self._deep = False
+    
+    def make_proxy(self, max_size: Tuple[int, int]) -> Optional['ImageDecoder']:
+        """
+        生成适应 max_size 的降采样代理解密器（用于实时预览）
+        采用最近邻抽样：解密是逐像素映射，代理的解密结果即全图结果的抽样
+        """
+        if self.encrypted_image is None:
+            return None
+        image = self.encrypted_image
+        width, height = image.size
+        ratio = min(1.0, max_size[0] / width, max_size[1] / height)
+        if ratio < 1.0:
+            size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+            image = image.resize(size, Image.Resampling.NEAREST)
+        
+        proxy = ImageDecoder()
+        proxy.encrypted_image = image
+        proxy.metadata = self.metadata
+        if self._deep:
+            # 16位像素不经过PIL，按相同的最近邻位置抽样
+            pixels = self._materialize()
+            if ratio < 1.0:
+                pixels = pixels[_nearest_indices(height, image.height)][:, _nearest_indices(width, image.width)]
+            proxy.resident_source = ResidentSource(image, pixels)
+        else:
+            proxy.build_resident_source()
+        return proxy
+    
+    def _current_source(self) -> Optional[ResidentSource]:
+        """当前图像的常驻源数据（lazy 模式下首次访问时建立，off 模式只复用已有的缓存）"""
+        cache = self.resident_source
+        if cache is not None and cache.matches(self.encrypted_image):
+            return cache
+        if self.resident == 'off':
+            return None
+        return self.build_resident_source()
+    
+    def _read_pixels(self, image: Image.Image) -> np.ndarray:
+        """
+        读取可直接解密的像素数组：16位彩色PNG读取完整的16位数据，
+        CMYK 等模式先转换（见 resident.decode_source）
+        """
+        if image.mode not in NATIVE_MODES:
+            with self.sink.stage(STAGE_CONVERT, mode=self._trace_mode, image_mode=image.mode):
+                image = decode_source(image)
+        with self.sink.stage(STAGE_MATERIALIZE, mode=self._trace_mode,
+                             image_mode=image.mode) as span:
+            img_array = None
+            if self._deep and image is self.encrypted_image:
+                img_array = read_deep_color_png(self.filepath)
+                if img_array is not None and img_array.shape[:2] != (image.height, image.width):
+                    img_array = None
+            if img_array is None:
+                img_array = np.asarray(image)
+            span.nbytes = img_array.nbytes
+        return img_array
+    
+    def _materialize(self, image: Optional[Image.Image] = None) -> np.ndarray:
+        """原始像素数据：常驻源数据的只读数组，或重新读取 image（默认为当前图像）"""
+        if image is None:
+            cache = self._current_source()
+            if cache is not None:
+                return cache.raw
+            image = self.encrypted_image
+        return self._read_pixels(image)
+    
+    def _run_plan(self, plan: DecodePlan) -> Optional[Image.Image]:
+        """
+        执行编译好的解密计划（大图像按行分带多线程处理）
+        L/LA/RGB/RGBA 及16位图像直接在原始位深上解密，alpha 通道原样透传；
+        调色板图像只解密调色板
+        """
+        if self.encrypted_image is None:
+            return None
+        for note in plan.notes:
+            self.sink.event('warning', mode=plan.mode, message=note)
+        
+        img_array = self._materialize()
+        if self.encrypted_image.mode in ('P', 'PA'):
+            return self._run_palette_plan(plan, img_array)
+        
+        kernel = functools.partial(plan.kernel, alpha=self.encrypted_image.mode in ALPHA_MODES)
+        with self.sink.stage(STAGE_TRANSFORM, mode=self._trace_mode or plan.mode) as span:
+            result = apply_banded(kernel, img_array, *plan.args, workers=self._workers)
+            span.nbytes = result.nbytes
+        return self._wrap_result(result)
+    
+    def _run_palette_plan(self, plan: DecodePlan, img_array: np.ndarray):
+        """
+        调色板图像：解密调色板中的各颜色，索引和透明度保持不变
+        返回图像时仍为调色板图像；返回数组时展开为RGB（有透明度时为RGBA）
+        """
+        image = self.encrypted_image
+        palette_mode = 'RGBA' if image.palette is not None and image.palette.mode == 'RGBA' else 'RGB'
+        colors = np.zeros((256, len(palette_mode)), dtype=np.uint8)
+        entries = np.frombuffer(bytes(image.getpalette(palette_mode) or []), dtype=np.uint8)
+        entries = entries[:colors.size].reshape(-1, len(palette_mode))
+        colors[:len(entries)] = entries
+        indices = img_array if img_array.ndim == 2 else img_array[:, :, 0]
+        
+        with self.sink.stage(STAGE_TRANSFORM, mode=self._trace_mode or plan.mode) as span:
+            palette = plan.run(colors[np.newaxis], alpha=palette_mode == 'RGBA')[0]
+            if self._output == 'image' and image.mode == 'P':
+                result = Image.fromarray(indices)
+                result.putpalette(palette.tobytes(), palette_mode)
+                if 'transparency' in image.info:
+                    result.info['transparency'] = image.info['transparency']
+                span.nbytes = indices.nbytes
+                return result
+            
+            if image.mode == 'PA':
+                alpha = img_array[:, :, 1]
+            elif palette_mode == 'RGBA':
+                alpha = None
+            elif 'transparency' in image.info:
+                transparency = image.info['transparency']
+                alpha_table = np.full(256, 255, dtype=np.uint8)
+                if isinstance(transparency, bytes):
+                    alpha_table[:len(transparency)] = np.frombuffer(transparency, dtype=np.uint8)[:256]
+                else:
+                    alpha_table[transparency] = 0
+                alpha = alpha_table[indices]
+            else:
+                alpha = None
+            result = palette[indices]
+            if alpha is not None:
+                result = np.dstack([result[:, :, :3], alpha])
+            span.nbytes = result.nbytes
+        return self._wrap_result(result)
+    
     def auto_detect_params(self) -> Optional[DecryptionParams]:
         """从元数据自动检测解密参数 - 完整支持自适应模式 v3.0"""
         if not self.metadata:
@@ -79,27 +294,12 @@ class ImageDecoder:
                 
             elif params.mode == 'channel_lsb':
                 # 处理通道位数（支持新旧格式）
-                if 'channel_bits' in meta_params and isinstance(meta_params['channel_bits'], dict):
-                    params.channel_bits = meta_params['channel_bits']
-                else:
-                    # 兼容旧格式
-                    params.channel_bits = {
-                        'R': meta_params.get('r_bits', meta_params.get('R', 2)),
-                        'G': meta_params.get('g_bits', meta_params.get('G', 3)),
-                        'B': meta_params.get('b_bits', meta_params.get('B', 4))
-                    }
+                params.channel_bits = normalize_channel_bits(meta_params)
                 params.quality = meta_params.get('quality', 0.8)
                 
             elif params.mode == 'smart_lsb':
                 # 处理位数范围（支持新旧格式）
-                if 'bit_range' in meta_params and isinstance(meta_params['bit_range'], dict):
-                    params.bit_range = meta_params['bit_range']
-                else:
-                    # 兼容旧格式
-                    params.bit_range = {
-                        'min': meta_params.get('min_bits', 1),
-                        'max': meta_params.get('max_bits', 5)
-                    }
+                params.bit_range = normalize_bit_range(meta_params)
                 params.threshold = meta_params.get('threshold', 0.5)
                 params.edge_protect = meta_params.get('edge_protect', True)
                 
@@ -115,32 +315,39 @@ class ImageDecoder:
                 params.strategy_params = meta_params.get('strategy_params', {})
                 params.decryption_guide = meta_params.get('decryption_guide', {})
                 
-                # 调试输出
-                print(f"[自适应模式解密] 检测到的参数:")
-                print(f"  版本: {params.version}")
-                print(f"  选择策略: {params.selected_strategy}")
-                print(f"  策略参数: {params.strategy_params}")
+                self.sink.event('adaptive_params', mode='adaptive', version=params.version,
+                                strategy=params.selected_strategy,
+                                strategy_params=params.strategy_params)
                 
                 # 验证策略信息完整性
                 if not params.selected_strategy:
-                    print("[警告] 未找到策略信息，尝试从解密指导中获取")
                     # 尝试从解密指导信息中获取
                     if params.decryption_guide and 'strategy' in params.decryption_guide:
                         params.selected_strategy = params.decryption_guide['strategy']
-                        print(f"  从解密指导获取策略: {params.selected_strategy}")
+                        self.sink.event('warning', mode='adaptive',
+                                        message='未找到策略信息，从解密指导获取',
+                                        strategy=params.selected_strategy)
                     else:
                         # 使用默认策略
-                        print("[警告] 使用默认策略: simple_lsb")
+                        self.sink.event('warning', mode='adaptive',
+                                        message='未找到策略信息，使用默认策略', strategy='simple_lsb')
                         params.selected_strategy = 'simple_lsb'
                         params.strategy_params = {'bits': 2, 'strength': 1.0}
                 
                 # 验证策略参数完整性
                 if params.selected_strategy and not params.strategy_params:
-                    print("[警告] 策略参数缺失，使用默认参数")
+                    self.sink.event('warning', mode='adaptive', message='策略参数缺失，使用默认参数',
+                                    strategy=params.selected_strategy)
                     params.strategy_params = self._get_default_strategy_params(params.selected_strategy)
                 
         return params
     
+    def search_params(self, top_k: int = 5, **kwargs) -> List[DecryptionParams]:
+        """元数据缺失时暴力搜索解密参数，按评分从高到低返回前 top_k 个"""
+        if self.encrypted_image is None:
+            return []
+        return [result.params for result in search_params(self.encrypted_image, top_k, **kwargs)]
+    
     def _get_default_strategy_params(self, strategy: str) -> Dict:
         """获取策略的默认参数"""
         if strategy == 'simple_lsb':
@@ -163,131 +370,18 @@ class ImageDecoder:
                           resolution: float = 0.5, direction: bool = False,
                           brightness: int = 55) -> Optional[Image.Image]:
         """解密默认模式（色阶映射）"""
-        if self.encrypted_image is None:
-            return None
-
-        img_array = np.array(self.encrypted_image).astype(np.float32)
-
         # k 参数对应 boundary，l 参数对应 brightness
-        k = boundary
-        l = brightness
-
-        if mode_type == 'dark':
-            # 暗色模式：
-            # [0, k] 范围按比例映射到 [0, 255]
-            # (k, 255] 范围设为 k
-            
-            # 创建查找表
-            lut = np.zeros(256, dtype=np.float32)
-            for x in range(256):
-                if x <= k:
-                    # [0, k] -> [0, 255] 的映射
-                    if k > 0:
-                        lut[x] = (x * 255.0 / k)
-                    else:
-                        lut[x] = 0
-                else:
-                    # (k, 255] -> k
-                    lut[x] = k
-
-        else:  # light mode
-            # 亮色模式：
-            # [0, k] 范围设为 l
-            # [k, 255] 范围按比例映射到 [0, 255]
-            
-            # 创建查找表
-            lut = np.zeros(256, dtype=np.float32)
-            for x in range(256):
-                if x < k:
-                    # [0, k) -> l
-                    lut[x] = l
-                else:
-                    # [k, 255] -> [0, 255] 的映射
-                    if k < 255:
-                        lut[x] = ((x - k) * 255.0 / (255 - k))
-                    else:
-                        lut[x] = 255
-
-        # 应用查找表到图像
-        if len(img_array.shape) == 3:
-            # RGB图像
-            result = np.zeros_like(img_array)
-            for c in range(3):
-                channel = img_array[:, :, c].astype(np.int32)
-                channel = np.clip(channel, 0, 255)
-                result[:, :, c] = lut[channel]
-        else:
-            # 灰度图像
-            img_clipped = np.clip(img_array.astype(np.int32), 0, 255)
-            result = lut[img_clipped]
-
-        return Image.fromarray(result.astype(np.uint8))
+        # 暗色模式：[0, k] 按比例映射到 [0, 255]，(k, 255] 设为 k
+        # 亮色模式：[0, k) 设为 l，[k, 255] 按比例映射到 [0, 255]
+        return self._run_plan(default_plan(mode_type, boundary, brightness))
     
     def decrypt_simple_lsb(self, bits: int = 2, strength: float = 1.0) -> Optional[Image.Image]:
-        """解密简单LSB模式 - 支持1-8位"""
-        if self.encrypted_image is None:
-            return None
-            
-        img_array = np.array(self.encrypted_image)
-        
-        # 限制位数范围（1-8）
-        bits = max(1, min(8, bits))
-        
-        # 提取最低有效位
-        mask = (1 << bits) - 1
-        extracted = img_array & mask
-        
-        # 扩展到完整范围
-        shift = 8 - bits
-        result = extracted << shift
-        
-        # 填充剩余位（改进的填充算法）
-        remaining_bits = shift
-        while remaining_bits > 0:
-            bits_to_copy = min(bits, remaining_bits)
-            result |= (extracted >> (bits - bits_to_copy)) << (remaining_bits - bits_to_copy)
-            remaining_bits -= bits_to_copy
-                
-        return Image.fromarray(result.astype(np.uint8))
+        """解密简单LSB模式 - 支持1-8位（16位图像支持1-16位）"""
+        return self._run_plan(lsb_plan(bits))
     
     def decrypt_channel_lsb(self, channel_bits: Dict[str, int], quality: float = 1) -> Optional[Image.Image]:
-        """解密通道自适应LSB模式 - 支持1-8位"""
-        if self.encrypted_image is None:
-            return None
-            
-        if self.encrypted_image.mode != 'RGB':
-            self.encrypted_image = self.encrypted_image.convert('RGB')
-            
-        img_array = np.array(self.encrypted_image)
-        result = np.zeros_like(img_array)
-        
-        # 获取每个通道的位数
-        r_bits = min(8, max(1, channel_bits.get('R', 2)))
-        g_bits = min(8, max(1, channel_bits.get('G', 3)))
-        b_bits = min(8, max(1, channel_bits.get('B', 4)))
-        channel_bits_list = [r_bits, g_bits, b_bits]
-        
-        for c in range(3):
-            bits = channel_bits_list[c]
-            
-            if bits == 8:
-                # 如果使用全部8位，通道完全是底图数据
-                result[:, :, c] = img_array[:, :, c]
-            else:
-                mask = (1 << bits) - 1
-                extracted = img_array[:, :, c] & mask
-                
-                shift = 8 - bits
-                result[:, :, c] = extracted << shift
-                
-                # 填充剩余位
-                remaining_bits = shift
-                while remaining_bits > 0:
-                    bits_to_copy = min(bits, remaining_bits)
-                    result[:, :, c] |= (extracted >> (bits - bits_to_copy)) << (remaining_bits - bits_to_copy)
-                    remaining_bits -= bits_to_copy
-                    
-        return Image.fromarray(result.astype(np.uint8))
+        """解密通道自适应LSB模式 - 支持1-8位，16位图像1-16位（每个通道一张查找表）"""
+        return self._run_plan(channel_plan(channel_bits))
     
     def decrypt_smart_lsb(self, bit_range: Dict[str, int], threshold: float = 0.5, 
                         edge_protect: bool = False) -> Optional[Image.Image]:
@@ -295,191 +389,105 @@ class ImageDecoder:
         解密智能分布LSB模式 - 简化统一版 v2.0
         使用与加密完全一致的逻辑
         """
-        if self.encrypted_image is None:
-            return None
-        
-        img_array = np.array(self.encrypted_image)
-        
-        # 获取位数范围
-        min_bits = max(1, min(3, bit_range.get('min', 1)))
-        max_bits = max(3, min(8, bit_range.get('max', 5)))
-        
-        # 使用与加密完全一致的位数计算
-        # 线性插值计算位数
-        avg_bits = min_bits + (max_bits - min_bits) * threshold
-        # 四舍五入并限制范围
-        avg_bits = int(round(avg_bits))
-        avg_bits = max(min_bits, min(max_bits, avg_bits))
-        
-        # 提取最低有效位
-        mask = (1 << avg_bits) - 1
-        extracted = img_array & mask
-        
-        # 扩展到完整范围
-        shift = 8 - avg_bits
-        result = extracted << shift
-        
-        # 填充剩余位以改善视觉效果
-        remaining_bits = shift
-        temp_extracted = extracted
-        while remaining_bits > 0:
-            bits_to_copy = min(avg_bits, remaining_bits)
-            if avg_bits > 0:
-                result |= (temp_extracted >> max(0, avg_bits - bits_to_copy)) << max(0, remaining_bits - bits_to_copy)
-            remaining_bits -= bits_to_copy
-        
-        return Image.fromarray(result.astype(np.uint8))
+        return self._run_plan(smart_plan(bit_range, threshold))
     
     def decrypt_adaptive(self, threshold: float = 0.5, strategy: str = None, 
                         strategy_params: Dict = None, **kwargs) -> Optional[Image.Image]:
         """
         解密多策略自适应模式 - 完整版 v3.0
-        基于元数据中的具体策略信息进行精确解密
+        基于元数据中的具体策略信息进行精确解密（策略解析见 plans.adaptive_plan）
         """
+        plan = adaptive_plan(threshold, strategy, strategy_params, kwargs.get('decryption_guide'))
+        self.sink.event('adaptive_strategy', mode='adaptive', plan=plan.key)
+        return self._run_plan(plan)
+    
+    @property
+    def max_lsb_bits(self) -> int:
+        """当前图像可提取的LSB位数上限：16位源数据为 MAX_LSB_BITS，其余为8（更多位数按8位解密）"""
+        if self.encrypted_image is None:
+            return 8
+        cache = self.resident_source
+        if cache is not None and cache.matches(self.encrypted_image):
+            return MAX_LSB_BITS if source_depth(cache.raw) > 8 else 8
+        return MAX_LSB_BITS if self._deep or self.encrypted_image.mode.startswith('I') else 8
+    
+    def image_digest(self) -> Optional[str]:
+        """当前图像的内容摘要（每个图像对象只计算一次）"""
         if self.encrypted_image is None:
             return None
+        if self._digest is None or self._digest[0] is not self.encrypted_image:
+            # 按常驻源数据计算：不复制像素，且包含16位彩色PNG不在PIL图像中的低字节
+            self._digest = (self.encrypted_image,
+                            image_digest(self.encrypted_image, self._materialize()))
+        return self._digest[1]
+    
+    def _wrap_result(self, result: np.ndarray):
+        """按请求的返回形式包装解密结果（uint8数组不再做多余的类型转换）"""
+        if self._output == 'image':
+            with self.sink.stage(STAGE_WRAP, mode=self._trace_mode) as span:
+                image = Image.fromarray(result)
+                span.nbytes = result.nbytes
+            return image
+        return result
+    
+    def decrypt(self, params: DecryptionParams, output: str = 'image',
+                workers: Optional[int] = 1):
+        """
+        根据参数解密图像 - 增强版（配置了结果缓存时优先命中缓存）
+        output: 'image' 返回PIL图像；'array' 返回uint8数组；
+        'memoryview' 返回数组的memoryview。不需要PIL图像的调用方
+        （批量写出、评分）可避免构造图像的整帧复制
+        workers: 变换的线程数，None/0 为全部核心；图像小于
+        lut.PARALLEL_MIN_PIXELS 时始终单线程
+        """
+        if output not in ('image', 'array', 'memoryview'):
+            raise ValueError(f"未知的返回形式: {output}")
         
-        print(f"[自适应解密] 开始解密:")
-        print(f"  策略: {strategy}")
-        print(f"  参数: {strategy_params}")
+        plan = compile_plan(params)
+        if plan is None:
+            print(f"未知模式: {params.mode}")
+            return None
         
-        # 如果没有提供策略，尝试使用阈值推断（向后兼容）
-        if not strategy or not strategy_params:
-            print("[自适应解密] 策略信息不完整，尝试推断...")
-            
-            # 检查是否有解密指导信息
-            if kwargs.get('decryption_guide'):
-                guide = kwargs['decryption_guide']
-                strategy = guide.get('strategy', 'simple_lsb')
-                print(f"  从解密指导获取策略: {strategy}")
+        self._output = 'image' if output == 'image' else 'array'
+        self._trace_mode = params.mode
+        self._workers = workers
+        try:
+            if self.result_cache is None or self.encrypted_image is None:
+                result = self._run_plan(plan)
             else:
-                # 使用阈值推断策略（向后兼容旧版本）
-                if threshold < 0.3:
-                    strategy = 'simple_lsb'
-                    strategy_params = {'bits': 2, 'strength': 1.0}
-                elif threshold < 0.7:
-                    strategy = 'channel_lsb'
-                    strategy_params = {
-                        'channel_bits': {'R': 2, 'G': 3, 'B': 4},
-                        'quality': 0.8
-                    }
+                key = ResultCache.make_key(self.image_digest(), plan.key, self._output)
+                result = self.result_cache.get(key)
+                if result is not None:
+                    self.sink.event('cache_hit', mode=params.mode)
                 else:
-                    strategy = 'smart_lsb'
-                    strategy_params = {
-                        'bit_range': {'min': 1, 'max': 5},
-                        'threshold': threshold,
-                        'edge_protect': True
-                    }
-                print(f"  推断策略: {strategy}")
+                    result = self._run_plan(plan)
+                    if isinstance(result, np.ndarray):
+                        # 缓存中的数组可能被多次返回，设为只读
+                        result.flags.writeable = False
+                    if result is not None:
+                        self.result_cache.put(key, result)
+        finally:
+            self._output = 'image'
+            self._trace_mode = None
+            self._workers = 1
         
-        # 根据具体策略进行解密
+        self.decrypted_image = result
+        if output == 'memoryview' and result is not None:
+            return memoryview(result)
+        return result
+
+    def decrypt_streaming(self, params: DecryptionParams, output_path: str,
+                          strip_height: int = 256, compress_level: int = 6) -> bool:
+        """
+        分条流式解密已加载的图像并直接写出到文件（.png/.npy/.raw）
+        不在内存中保留完整的解密结果，适用于超大图像
+        """
+        if self.filepath is None:
+            return False
         try:
-            if strategy == 'simple_lsb':
-                print("[自适应解密] 使用简单LSB策略")
-                bits = strategy_params.get('bits', 2)
-                strength = strategy_params.get('strength', 1.0)
-                return self.decrypt_simple_lsb(bits=bits, strength=strength)
-                
-            elif strategy == 'channel_lsb':
-                print("[自适应解密] 使用通道LSB策略")
-                # 处理通道位数参数的不同格式
-                if 'channel_bits' in strategy_params and isinstance(strategy_params['channel_bits'], dict):
-                    channel_bits = strategy_params['channel_bits']
-                elif 'r_bits' in strategy_params:
-                    # 兼容旧格式
-                    channel_bits = {
-                        'R': strategy_params.get('r_bits', 2),
-                        'G': strategy_params.get('g_bits', 3),
-                        'B': strategy_params.get('b_bits', 4)
-                    }
-                else:
-                    # 直接从参数中获取
-                    channel_bits = {
-                        'R': strategy_params.get('R', 2),
-                        'G': strategy_params.get('G', 3),
-                        'B': strategy_params.get('B', 4)
-                    }
-                
-                quality = strategy_params.get('quality', 0.8)
-                print(f"  通道位数: R={channel_bits['R']}, G={channel_bits['G']}, B={channel_bits['B']}")
-                return self.decrypt_channel_lsb(channel_bits=channel_bits, quality=quality)
-                
-            elif strategy == 'smart_lsb':
-                print("[自适应解密] 使用智能LSB策略")
-                # 处理位数范围参数的不同格式
-                if 'bit_range' in strategy_params and isinstance(strategy_params['bit_range'], dict):
-                    bit_range = strategy_params['bit_range']
-                elif 'min_bits' in strategy_params:
-                    # 兼容旧格式
-                    bit_range = {
-                        'min': strategy_params.get('min_bits', 1),
-                        'max': strategy_params.get('max_bits', 5)
-                    }
-                else:
-                    # 默认值
-                    bit_range = {'min': 1, 'max': 5}
-                
-                threshold = strategy_params.get('threshold', 0.5)
-                edge_protect = strategy_params.get('edge_protect', True)
-                print(f"  位数范围: {bit_range['min']}-{bit_range['max']}, 阈值: {threshold}")
-                return self.decrypt_smart_lsb(
-                    bit_range=bit_range,
-                    threshold=threshold,
-                    edge_protect=edge_protect
-                )
-            else:
-                print(f"[自适应解密] 未知策略 '{strategy}'，使用默认简单LSB")
-                return self.decrypt_simple_lsb(2, 1.0)
-                
+            decrypt_streaming(self.filepath, output_path, params, strip_height, compress_level,
+                              sink=self.sink)
+            return True
         except Exception as e:
-            print(f"[自适应解密] 策略解密失败: {e}")
-            import traceback
-            traceback.print_exc()
-            # 尝试使用默认策略
-            print("[自适应解密] 尝试使用默认策略...")
-            return self.decrypt_simple_lsb(2, 1.0)
-    
-    def decrypt(self, params: DecryptionParams) -> Optional[Image.Image]:
-        """根据参数解密图像 - 增强版"""
-        if params.mode == 'default':
-            self.decrypted_image = self.decrypt_default_mode(
-                params.mode_type or 'light',
-                params.boundary or 128,
-                params.resolution or 0.5,
-                params.direction or False,
-                params.brightness or 55
-            )
-        elif params.mode == 'simple_lsb':
-            self.decrypted_image = self.decrypt_simple_lsb(
-                params.bits or 2,
-                params.strength or 1.0
-            )
-        elif params.mode == 'channel_lsb':
-            bits = params.channel_bits or {'R': 2, 'G': 3, 'B': 4}
-            self.decrypted_image = self.decrypt_channel_lsb(
-                bits,
-                params.quality or 0.8
-            )
-        elif params.mode == 'smart_lsb':
-            bit_range = params.bit_range or {'min': 1, 'max': 5}
-            self.decrypted_image = self.decrypt_smart_lsb(
-                bit_range,
-                params.threshold or 0.5,
-                params.edge_protect if params.edge_protect is not None else True
-            )
-        elif params.mode == 'adaptive':
-            # 自适应模式 - 使用完整的策略信息
-            self.decrypted_image = self.decrypt_adaptive(
-                threshold=params.threshold or 0.5,
-                strategy=params.selected_strategy,
-                strategy_params=params.strategy_params,
-                decryption_guide=params.decryption_guide,
-                precision=params.precision,
-                priority=params.priority,
-                version=params.version
-            )
-        else:
-            print(f"未知模式: {params.mode}")
-            return None
-            
-        return self.decrypted_image
\ No newline at end of file
+            print(f"流式解密失败: {e}")
+            return False
@@ -0,0 +1,75 @@
+"""
+16位彩色PNG的完整像素读取
+PIL 将每通道16位的RGB/RGBA PNG读为8位（丢弃低字节，其中的LSB数据随之丢失）；
+安装了OpenCV时改用 cv2 解码完整的16位数据
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - 可选依赖
+    cv2 = None
+
+from .png_chunks import PNG_SIGNATURE
+
+# IHDR 中的彩色类型：真彩色、带alpha的真彩色
+DEEP_COLOR_TYPES = (2, 6)
+
+
+def _read_bytes(source, size: int = -1) -> bytes:
+    """读取文件路径或文件对象开头的数据（文件对象的读取位置保持不变）"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read(size)
+    position = source.tell()
+    source.seek(0)
+    try:
+        return source.read(size)
+    finally:
+        source.seek(position)
+
+
+def deep_color_supported() -> bool:
+    """能否读取完整的16位数据（需要OpenCV）"""
+    return cv2 is not None
+
+
+def is_deep_color_png(source) -> bool:
+    """是否为每通道16位的RGB/RGBA PNG（只读取文件头）"""
+    try:
+        header = _read_bytes(source, 26)
+    except (OSError, AttributeError, ValueError):
+        return False
+    if len(header) < 26 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return False
+    bit_depth, color_type = header[24], header[25]
+    return bit_depth == 16 and color_type in DEEP_COLOR_TYPES
+
+
+def decode_deep_color_png(data: bytes) -> Optional[np.ndarray]:
+    """
+    将16位彩色PNG的文件内容解码为 uint16 数组，通道顺序为RGB(A)
+    未安装OpenCV或解码失败时返回None
+    """
+    if cv2 is None:
+        return None
+    pixels = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if pixels is None or pixels.dtype != np.uint16 or pixels.ndim != 3:
+        return None
+    # OpenCV 为 BGR(A) 顺序
+    order = (2, 1, 0, 3)[:pixels.shape[2]]
+    return np.ascontiguousarray(pixels[:, :, order])
+
+
+def read_deep_color_png(source) -> Optional[np.ndarray]:
+    """
+    以 uint16 数组读取16位彩色PNG（文件路径或文件对象）
+    未安装OpenCV或解码失败时返回None（调用方退回PIL读取的8位数据）
+    """
+    if cv2 is None:
+        return None
+    return decode_deep_color_png(_read_bytes(source))
@@ -0,0 +1,248 @@
+"""
+解密流程的插桩
+各阶段（打开文件、解析元数据、像素读取、模式转换、变换、编码）
+以结构化事件的形式发送到可替换的接收器：
+- NullSink: 默认，不做任何事
+- JsonLinesSink: 每个事件一行JSON，便于离线分析
+- StatsSink: 内存聚合，按阶段（及解密模式）统计 p50/p95
+离线汇总: python -m core.trace_summary trace.jsonl [--by-mode]
+"""
+
+import abc
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# 标准阶段名
+STAGE_OPEN = 'open'                # 打开文件
+STAGE_METADATA = 'metadata'        # 解析元数据
+STAGE_MATERIALIZE = 'materialize'  # 解码像素数据到内存
+STAGE_CONVERT = 'convert'          # 颜色模式转换
+STAGE_TRANSFORM = 'transform'      # 解密变换
+STAGE_WRAP = 'wrap'                # 由结果数组构造PIL图像
+STAGE_ENCODE = 'encode'            # 结果编码写出文件
+
+
+@dataclass
+class Event:
+    """一条插桩事件；seconds 为0的是不计时的日志事件"""
+    stage: str
+    seconds: float = 0.0
+    nbytes: int = 0
+    mode: Optional[str] = None
+    fields: Dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+
+class _Span:
+    """计时上下文：退出时发送一条事件，nbytes/mode 可在块内补充"""
+    __slots__ = ('sink', 'stage', 'mode', 'nbytes', 'fields', '_start')
+
+    def __init__(self, sink: 'Sink', stage: str, mode: Optional[str], fields: Dict):
+        self.sink = sink
+        self.stage = stage
+        self.mode = mode
+        self.nbytes = 0
+        self.fields = fields
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.fields['error'] = f"{exc_type.__name__}: {exc}"
+        self.sink.emit(Event(self.stage, seconds, int(self.nbytes), self.mode, self.fields))
+        return False
+
+
+class _NullSpan:
+    """不计时的空上下文（所有NullSink共用同一个实例）"""
+    __slots__ = ('nbytes', 'mode')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Sink(abc.ABC):
+    """事件接收器基类，子类实现 emit"""
+    enabled = True
+
+    @abc.abstractmethod
+    def emit(self, event: Event):
+        """接收一个事件"""
+
+    def stage(self, stage: str, mode: Optional[str] = None, **fields) -> _Span:
+        """为一个阶段计时：with sink.stage('transform', mode=...) as span: ..."""
+        return _Span(self, stage, mode, fields)
+
+    def event(self, stage: str, mode: Optional[str] = None, **fields):
+        """发送不计时的日志事件（替代调试输出）"""
+        self.emit(Event(stage, mode=mode, fields=fields))
+
+    def close(self):
+        pass
+
+
+class NullSink(Sink):
+    """默认接收器：丢弃所有事件，stage() 返回共享的空上下文"""
+    enabled = False
+
+    def emit(self, event: Event):
+        pass
+
+    def stage(self, stage: str, mode: Optional[str] = None, **fields) -> _NullSpan:
+        return _NULL_SPAN
+
+    def event(self, stage: str, mode: Optional[str] = None, **fields):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+class JsonLinesSink(Sink):
+    """将事件逐行写为JSON（文件路径或已打开的文本流）"""
+
+    def __init__(self, target, append: bool = True):
+        if isinstance(target, str):
+            self._file = open(target, 'a' if append else 'w', encoding='utf-8', buffering=1)
+            self._owned = True
+        else:
+            self._file = target
+            self._owned = False
+        self._lock = threading.Lock()
+
+    def emit(self, event: Event):
+        line = json.dumps(asdict(event), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            if self._owned and not self._file.closed:
+                self._file.close()
+
+
+class StatsSink(Sink):
+    """
+    内存聚合：记录各阶段耗时，按阶段或 (阶段, 模式) 汇总
+    window 为每个键保留的最近记录数（None 不限），p50/p95 按窗口内记录计算，
+    次数、总耗时和数据量始终累计；常驻服务应设置 window 以限制内存
+    """
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window
+        self._records: Dict[Tuple[str, Optional[str]], Deque[Tuple[float, int]]] = \
+            defaultdict(lambda: deque(maxlen=window))
+        self._totals: Dict[Tuple[str, Optional[str]], List[float]] = defaultdict(lambda: [0, 0.0, 0])
+        self._lock = threading.Lock()
+
+    def emit(self, event: Event):
+        if event.seconds <= 0:
+            return
+        key = (event.stage, event.mode)
+        with self._lock:
+            self._records[key].append((event.seconds, event.nbytes))
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += event.seconds
+            totals[2] += event.nbytes
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._totals.clear()
+
+    def summary(self, by_mode: bool = False) -> Dict[str, Dict[str, float]]:
+        """
+        返回 {键: {count, total, p50, p95, mb}}
+        键为阶段名；by_mode=True 时为 "阶段/模式"
+        """
+        groups: Dict[str, List[float]] = defaultdict(list)
+        totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0])
+        with self._lock:
+            for (stage, mode), records in self._records.items():
+                key = f"{stage}/{mode or '-'}" if by_mode else stage
+                groups[key].extend(s for s, _ in records)
+                for i, value in enumerate(self._totals[(stage, mode)]):
+                    totals[key][i] += value
+
+        summary = {}
+        for key in sorted(groups):
+            p50, p95 = np.percentile(np.array(groups[key]), [50, 95])
+            count, total, nbytes = totals[key]
+            summary[key] = {
+                'count': count,
+                'total': float(total),
+                'p50': float(p50),
+                'p95': float(p95),
+                'mb': nbytes / (1024 * 1024),
+            }
+        return summary
+
+    def format_table(self, by_mode: bool = False) -> str:
+        """汇总表（毫秒）"""
+        lines = [f"{'阶段':24s} {'次数':>6s} {'p50 ms':>10s} {'p95 ms':>10s} {'总计 s':>9s} {'MB':>9s}"]
+        for key, row in self.summary(by_mode).items():
+            lines.append(f"{key:24s} {row['count']:6d} {row['p50'] * 1000:10.2f} "
+                         f"{row['p95'] * 1000:10.2f} {row['total']:9.2f} {row['mb']:9.1f}")
+        return '\n'.join(lines)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> 'StatsSink':
+        stats = cls()
+        for event in events:
+            stats.emit(event)
+        return stats
+
+
+class TeeSink(Sink):
+    """同时发送到多个接收器"""
+
+    def __init__(self, *sinks: Sink):
+        self.sinks = [s for s in sinks if s.enabled]
+
+    def emit(self, event: Event):
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def read_jsonl(filepath: str) -> Iterator[Event]:
+    """读取 JsonLinesSink 写出的事件（跳过无法解析的行）"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield Event(**json.loads(line))
+            except (ValueError, TypeError):
+                continue
+
+
+_default_sink: Sink = NULL_SINK
+
+
+def default_sink() -> Sink:
+    """新建解密器时使用的接收器"""
+    return _default_sink
+
+
+def set_default_sink(sink: Optional[Sink]):
+    """设置进程内默认接收器（None 恢复为 NullSink），只影响之后创建的解密器"""
+    global _default_sink
+    _default_sink = sink if sink is not None else NULL_SINK
@@ -0,0 +1,178 @@
+"""
+批量解密的断点日志
+每个任务一个只追加的 JSON-lines 文件，每处理完一个文件追加一条记录：
+源文件路径、大小、修改时间、内容摘要、规范化参数、输出路径和状态。
+中断后用同一日志重新运行即可从断点继续；再次运行时内容和参数都未变化的文件被跳过。
+大小和修改时间都未变化的文件不重新计算摘要，再次运行的开销只与新增（或修改）的文件数有关
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+# 记录状态
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 计算摘要时每次读取的字节数
+HASH_CHUNK = 1 << 20
+
+
+@dataclass
+class FileState:
+    """源文件的大小、修改时间（纳秒）和内容摘要"""
+    size: int
+    mtime: int
+    hash: Optional[str] = None
+
+    @classmethod
+    def stat(cls, path: str) -> 'FileState':
+        st = os.stat(path)
+        return cls(st.st_size, st.st_mtime_ns)
+
+
+def file_digest(path: str) -> str:
+    """文件内容摘要（分块读取，不一次载入整个文件）"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BatchJournal:
+    """
+    批量任务的断点日志
+    settings 为影响输出的任务设置（规范化参数、写出选项等），设置变化后全部文件重新处理；
+    同一源文件以最后一条记录为准，无法解析的行（如中断时写了一半的行）被忽略
+    """
+
+    def __init__(self, filepath: str, settings: Dict, hash_workers: int = 8):
+        self.filepath = filepath
+        self.settings = settings
+        self.hash_workers = hash_workers
+        self.records: Dict[str, Dict] = {}
+        self._states: Dict[str, FileState] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(filepath):
+            self._load()
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        self._file = open(filepath, 'a', encoding='utf-8', buffering=1)
+
+    def _load(self):
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self.records[record['path']] = record
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def _unchanged(self, record: Optional[Dict], output: str) -> bool:
+        """记录是否为相同设置下的成功结果，且输出文件仍然存在"""
+        return (record is not None and record.get('status') == STATUS_DONE
+                and record.get('params') == self.settings
+                and record.get('output') == os.path.abspath(output)
+                and os.path.exists(output))
+
+    def pending(self, tasks: List[Tuple[str, str]]
+                ) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        将 (源文件, 输出文件) 分为 (待处理, 已跳过)
+        大小和修改时间与记录一致时直接跳过；不一致时计算摘要，
+        内容未变（如只是修改时间变化）同样跳过，并追加一条更新后的记录
+        """
+        states: Dict[str, FileState] = {}
+        to_hash: List[Tuple[str, str]] = []
+        skipped: List[Tuple[str, str]] = []
+        for src, dst in tasks:
+            try:
+                state = FileState.stat(src)
+            except OSError:
+                to_hash.append((src, dst))
+                continue
+            states[src] = state
+            record = self.records.get(self._key(src))
+            if (self._unchanged(record, dst) and record.get('size') == state.size
+                    and record.get('mtime') == state.mtime):
+                skipped.append((src, dst))
+            else:
+                to_hash.append((src, dst))
+
+        def digest(task: Tuple[str, str]) -> Optional[str]:
+            try:
+                return file_digest(task[0])
+            except OSError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, self.hash_workers)) as pool:
+            digests = list(pool.map(digest, to_hash))
+
+        todo: List[Tuple[str, str]] = []
+        for (src, dst), file_hash in zip(to_hash, digests):
+            state = states.get(src)
+            if state is None or file_hash is None:
+                # 无法读取的文件交给解密流程报告错误
+                todo.append((src, dst))
+                continue
+            state.hash = file_hash
+            record = self.records.get(self._key(src))
+            if self._unchanged(record, dst) and record.get('hash') == file_hash:
+                self._append(src, dst, state, STATUS_DONE, record.get('mode'))
+                skipped.append((src, dst))
+            else:
+                self._states[self._key(src)] = state
+                todo.append((src, dst))
+        return todo, skipped
+
+    def record(self, result):
+        """追加一个文件的处理结果（batch.FileResult）"""
+        key = self._key(result.source)
+        state = self._states.pop(key, None)
+        if state is None:
+            try:
+                state = FileState.stat(result.source)
+                state.hash = file_digest(result.source)
+            except OSError:
+                state = FileState(-1, -1)
+        status = STATUS_DONE if result.ok else STATUS_FAILED
+        self._append(result.source, result.output, state, status, result.mode, result.error)
+
+    def _append(self, source: str, output: Optional[str], state: FileState, status: str,
+                mode: Optional[str] = None, error: Optional[str] = None):
+        record = {
+            'path': self._key(source),
+            **asdict(state),
+            'params': self.settings,
+            'mode': mode,
+            'output': os.path.abspath(output) if output else None,
+            'status': status,
+            'error': error,
+            'time': time.time(),
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.records[record['path']] = record
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,306 @@
+"""
+查找表（LUT）解密内核
+所有模式都是逐通道的逐像素映射：8位源数据使用256项查找表，
+16位源数据使用65536项查找表，均通过一次gather完成变换。
+alpha 通道原样透传，不参与解密
+"""
+
+import contextlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence, Union
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # 未安装OpenCV时退回NumPy实现
+    cv2 = None
+
+# 低于该像素数时分带并行得不偿失，直接单线程处理
+PARALLEL_MIN_PIXELS = 4 * 1024 * 1024
+
+# 设置了取消检查时（见 cancellable）每带的像素数，每带开始前检查一次
+CANCEL_BAND_PIXELS = 1024 * 1024
+
+# LSB解密支持的最大位数（16位图像）
+MAX_LSB_BITS = 16
+
+# alpha 等透传通道使用的恒等查找表
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+IDENTITY_LUT.flags.writeable = False
+
+
+@lru_cache(maxsize=None)
+def build_lsb_lut(bits: int, depth: int = 8) -> np.ndarray:
+    """
+    构建LSB解密查找表（带缓存，返回只读数组）
+    depth 为源数据位深：8位为256项表；16位为65536项表，位数不超过8时
+    与8位表作用于低字节的结果相同，超过8时取提取出的各位中的高8位
+    """
+    if depth > 8:
+        values = np.arange(1 << 16, dtype=np.uint32)
+        bits = max(1, min(MAX_LSB_BITS, int(bits)))
+        if bits <= 8:
+            lut = build_lsb_lut(bits)[values & 0xFF]
+        else:
+            lut = ((values & ((1 << bits) - 1)) >> (bits - 8)).astype(np.uint8)
+        lut.flags.writeable = False
+        return lut
+
+    bits = max(1, min(8, int(bits)))
+    values = np.arange(256, dtype=np.uint8)
+
+    # 提取最低有效位
+    mask = (1 << bits) - 1
+    extracted = values & mask
+
+    # 扩展到完整范围
+    shift = 8 - bits
+    lut = extracted << shift
+
+    # 填充剩余位（与原逐像素算法完全一致）
+    remaining_bits = shift
+    while remaining_bits > 0:
+        bits_to_copy = min(bits, remaining_bits)
+        lut |= (extracted >> (bits - bits_to_copy)) << (remaining_bits - bits_to_copy)
+        remaining_bits -= bits_to_copy
+
+    lut = lut.astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def smart_lsb_bits(min_bits: int, max_bits: int, threshold: float) -> int:
+    """智能LSB模式下的实际位数（线性插值并四舍五入）"""
+    min_bits = max(1, min(3, min_bits))
+    max_bits = max(3, min(8, max_bits))
+    avg_bits = min_bits + (max_bits - min_bits) * threshold
+    avg_bits = int(round(avg_bits))
+    return max(min_bits, min(max_bits, avg_bits))
+
+
+def _as_uint8(img_array: np.ndarray) -> np.ndarray:
+    """非uint8整型数据取低8位（与原算法截断为uint8的结果一致）"""
+    if img_array.dtype == np.uint8:
+        return img_array
+    return (img_array & 0xFF).astype(np.uint8)
+
+
+def _as_uint16(img_array: np.ndarray) -> np.ndarray:
+    """16位查表的源数据（int32 等类型取低16位）"""
+    if img_array.dtype == np.uint16:
+        return img_array
+    return (img_array & 0xFFFF).astype(np.uint16)
+
+
+def source_depth(img_array: np.ndarray) -> int:
+    """源数据位深：uint8/bool 为8位，其余整型按16位处理"""
+    return 8 if img_array.dtype.itemsize == 1 else 16
+
+
+def _stack_luts(luts: Sequence[np.ndarray]) -> np.ndarray:
+    """将逐通道查找表合并为 OpenCV 需要的 (1, 256, C) 形式"""
+    return np.ascontiguousarray(np.stack(luts, axis=-1).reshape(1, 256, len(luts)))
+
+
+def apply_lut(img_array: np.ndarray,
+              luts: Union[np.ndarray, Sequence[np.ndarray]],
+              alpha: bool = False,
+              out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    应用查找表（uint8 输出）
+    luts 为单个表时作用于所有颜色通道；为表序列时按最后一维逐通道应用，
+    单通道源数据（灰度）配多个表时输出与表数相同的通道；
+    alpha 为True时最后一个通道为alpha，原样透传（16位alpha取高字节）。
+    256项表作用于源数据的低8位，65536项表作用于16位源数据
+    """
+    channels = img_array.shape[2] if img_array.ndim == 3 else 1
+    color = channels - 1 if alpha else channels
+    per_channel = not isinstance(luts, np.ndarray)
+    tables = list(luts) if per_channel else [luts] * color
+    if color != len(tables) and color != 1:
+        raise ValueError(f"通道数不匹配: 图像 {img_array.shape}, 查找表 {len(tables)}")
+    out_channels = len(tables) + alpha
+    shape = img_array.shape[:2] + ((out_channels,) if img_array.ndim == 3 or out_channels > 1 else ())
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+
+    deep = tables[0].size > 256
+    src = _as_uint16(img_array) if deep else _as_uint8(img_array)
+
+    if cv2 is not None and not deep and out_channels == channels and channels <= 4:
+        # cv2.LUT 为SIMD实现，比 NumPy 的 gather 快数倍
+        if per_channel or alpha:
+            table = _stack_luts(tables + [IDENTITY_LUT] * alpha)
+        else:
+            table = luts
+        result = cv2.LUT(src, table, dst=out)
+        if result is not out:
+            out[...] = result
+        return out
+
+    if src.ndim == 2 and out.ndim == 2:
+        np.take(tables[0], src, out=out, mode='wrap')
+        return out
+    src3 = src if src.ndim == 3 else src[:, :, np.newaxis]
+    for c, table in enumerate(tables):
+        np.take(table, src3[:, :, 0 if color == 1 else c], out=out[:, :, c], mode='wrap')
+    if alpha:
+        band = img_array[:, :, -1]
+        out[:, :, -1] = band if band.dtype == np.uint8 else _as_uint16(band) >> 8
+    return out
+
+
+def apply_lsb(img_array: np.ndarray, bits: Union[int, Sequence[int]],
+              alpha: bool = False, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    LSB解密内核
+    bits 为所有颜色通道的统一位数，或逐通道位数（如RGB的 (2, 3, 4)）；
+    16位源数据最多可提取16位
+    """
+    depth = source_depth(img_array)
+    if isinstance(bits, (int, np.integer)):
+        luts = build_lsb_lut(bits, depth)
+    else:
+        luts = tuple(build_lsb_lut(b, depth) for b in bits)
+    return apply_lut(img_array, luts, alpha, out)
+
+
+@lru_cache(maxsize=None)
+def build_default_lut(mode_type: str, boundary, brightness) -> np.ndarray:
+    """
+    构建默认模式（色阶映射）查找表（带缓存，返回只读uint8数组）
+    计算过程与原float32实现逐项一致，保证结果逐位相同
+    """
+    k = boundary
+    l = brightness
+    x = np.arange(256, dtype=np.float64)
+
+    if mode_type == 'dark':
+        # [0, k] -> [0, 255]，(k, 255] -> k
+        scaled = x * 255.0 / k if k > 0 else np.zeros(256)
+        lut = np.where(x <= k, scaled, k)
+    else:
+        # [0, k) -> l，[k, 255] -> [0, 255]
+        scaled = (x - k) * 255.0 / (255 - k) if k < 255 else np.full(256, 255.0)
+        lut = np.where(x < k, l, scaled)
+
+    lut = lut.astype(np.float32).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+@lru_cache(maxsize=None)
+def build_default_lut16(mode_type: str, boundary, brightness) -> np.ndarray:
+    """16位源数据的默认模式查找表：按高8位（色阶）映射"""
+    lut = build_default_lut(mode_type, boundary, brightness)[np.arange(1 << 16) >> 8]
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_default_mode(img_array: np.ndarray, mode_type: str = 'light',
+                       boundary: int = 128, brightness: int = 55,
+                       alpha: bool = False, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    默认模式解密引擎：直接在源数据上应用查找表
+    16位源数据按高8位映射；alpha 通道原样透传；
+    out 可传入预分配的uint8缓冲区以避免额外分配
+    """
+    if source_depth(img_array) > 8:
+        lut = build_default_lut16(mode_type, boundary, brightness)
+    else:
+        lut = build_default_lut(mode_type, boundary, brightness)
+    return apply_lut(img_array, lut, alpha, out)
+
+
+class DecodeCancelled(Exception):
+    """变换在分带之间被取消（见 cancellable）"""
+
+
+# 当前线程的取消检查函数
+_cancel_state = threading.local()
+
+
+@contextlib.contextmanager
+def cancellable(is_cancelled: Callable[[], bool]):
+    """
+    在本线程中执行的变换于各带开始前调用 is_cancelled()，返回True时抛出 DecodeCancelled，
+    用于交互界面中被新请求取代的解密尽快结束
+    """
+    previous = getattr(_cancel_state, 'check', None)
+    _cancel_state.check = is_cancelled
+    try:
+        yield
+    finally:
+        _cancel_state.check = previous
+
+
+def check_cancelled():
+    """本线程设置了取消检查且已取消时抛出 DecodeCancelled（用于各处理阶段之间）"""
+    check = getattr(_cancel_state, 'check', None)
+    if check is not None and check():
+        raise DecodeCancelled()
+
+
+_pools: Dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _band_pool(workers: int) -> ThreadPoolExecutor:
+    """按线程数复用的线程池（避免每次解密都创建线程）"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers,
+                                                        thread_name_prefix='lut-band')
+        return pool
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """workers 为 None 或 0 时使用全部CPU核心"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def apply_banded(kernel: Callable[..., np.ndarray], img_array: np.ndarray, *args,
+                 workers: Optional[int] = 1,
+                 min_pixels: int = PARALLEL_MIN_PIXELS) -> np.ndarray:
+    """
+    按行分带并行执行逐像素内核 kernel(src, *args, out=...)
+    各带写入同一个预分配的输出数组（形状由第一行的结果确定，
+    输出通道数可与源数据不同）；cv2.LUT 和 NumPy 的逐元素运算
+    执行期间释放GIL，因此线程池即可利用多核。
+    图像小于 min_pixels 或 workers<=1 时直接单线程调用；
+    本线程设置了取消检查（见 cancellable）时分成较小的带，每带开始前检查
+    """
+    workers = resolve_workers(workers)
+    height = img_array.shape[0]
+    pixels = height * (img_array.shape[1] if img_array.ndim > 1 else 1)
+    parallel = workers > 1 and pixels >= min_pixels and height >= 2 * workers
+    bands = workers if parallel else 1
+    check = getattr(_cancel_state, 'check', None)
+    if check is not None:
+        bands = max(bands, min(height, pixels // CANCEL_BAND_PIXELS))
+    if bands <= 1:
+        check_cancelled()
+        return kernel(img_array, *args)
+
+    out = np.empty((height,) + kernel(img_array[:1], *args).shape[1:], dtype=np.uint8)
+    bounds = np.linspace(0, height, bands + 1, dtype=int)
+
+    def run(band):
+        if check is not None and check():
+            raise DecodeCancelled()
+        start, stop = bounds[band], bounds[band + 1]
+        kernel(img_array[start:stop], *args, out=out[start:stop])
+
+    if parallel:
+        # list() 使工作线程中的异常在此处抛出
+        list(_band_pool(workers).map(run, range(bands)))
+    else:
+        for band in range(bands):
+            run(band)
+    return out
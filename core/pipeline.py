@@ -0,0 +1,372 @@
+"""
+三段式批量解密流水线
+读取（PIL中的zlib解压与像素读取）、解密变换和写出（PNG的zlib压缩）
+分别由独立的线程组执行，各段之间用有界队列连接。
+zlib、cv2 和 NumPy 运算执行期间释放GIL，编解码可以与变换重叠；
+有界队列使内存中的帧数不超过各段线程数与队列容量之和。
+每段统计处理耗时、等待输入（饥饿）和等待下游队列（背压）的时间及队列深度，
+用于确定各段的线程数。
+processes=True 时解密段在工作进程中执行，像素经共享内存块传递（见 core.slabs）
+"""
+
+import contextlib
+import functools
+import io
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .batch import FileResult, resolve_params, output_form
+from .resident import ALPHA_MODES
+from .decoder import ImageDecoder
+from .instrument import JsonLinesSink, NULL_SINK, Sink
+from .params import DecryptionParams
+from .plans import compile_plan
+from .saving import SaveOptions, DEFAULT_SAVE_OPTIONS, save_image
+from .slabs import SlabPool, SlabRef, attach
+
+# 各段名称（与统计表中的顺序一致）
+STAGE_NAMES = ('read', 'decode', 'write')
+
+# 流水线线程名前缀（非 verbose 模式下丢弃这些线程的输出）
+THREAD_PREFIX = 'pipeline-'
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """
+    流水线配置
+    readers/decoders/writers 为各段的线程数；
+    queue_size 为相邻两段之间队列的容量（帧数）；
+    processes 为True时解密段改用 decoders 个工作进程
+    """
+    readers: int = 2
+    decoders: int = 1
+    writers: int = 2
+    queue_size: int = 4
+    processes: bool = False
+
+    @classmethod
+    def parse(cls, spec: str, queue_size: int = 4, processes: bool = False) -> 'PipelineConfig':
+        """解析 "读取,解密,写出" 形式的线程数（如 "2,1,3"）"""
+        counts = [int(part) for part in spec.split(',')]
+        if len(counts) != 3 or min(counts) < 1:
+            raise ValueError(f"流水线线程数应为三个正整数，如 2,1,2: {spec}")
+        if queue_size < 1:
+            raise ValueError(f"队列容量应为正整数: {queue_size}")
+        return cls(*counts, queue_size=queue_size, processes=processes)
+
+    @property
+    def workers(self) -> Tuple[int, int, int]:
+        return self.readers, self.decoders, self.writers
+
+    @property
+    def max_frames(self) -> int:
+        """同时在流水线中的最大帧数（各段线程数与两个队列容量之和）"""
+        return self.readers + self.decoders + self.writers + 2 * self.queue_size
+
+
+@dataclass
+class StageStats:
+    """
+    单段的运行统计（秒）
+    busy 为处理耗时，starved 为等待输入的时间，blocked 为下游队列满时的等待时间；
+    队列深度在每次取出输入时采样
+    """
+    name: str
+    workers: int
+    capacity: int = 0       # 输入队列容量（0 为不限，即任务列表）
+    items: int = 0
+    failed: int = 0
+    busy: float = 0.0
+    starved: float = 0.0
+    blocked: float = 0.0
+    depth_total: int = 0
+    depth_samples: int = 0
+    depth_max: int = 0
+
+    @property
+    def mean_depth(self) -> float:
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
+
+    def utilization(self, elapsed: float) -> float:
+        """各线程处于处理状态的时间占比"""
+        return self.busy / max(elapsed * self.workers, 1e-9)
+
+
+@dataclass
+class _Frame:
+    """在各段之间传递的单个文件"""
+    source: str
+    output: str
+    manual_params: Optional[Dict]
+    result: FileResult
+    start: float = 0.0      # 进入读取段的时间
+    decoder: Optional[ImageDecoder] = None
+    params: Optional[DecryptionParams] = None
+    image: object = None
+    # 进程模式：帧当前所在的共享内存块及其描述符，源图像模式
+    slab: object = None
+    ref: Optional[SlabRef] = None
+    image_mode: str = ''
+
+
+def _decode_slab(src: SlabRef, dst_name: str, params: DecryptionParams,
+                 image_mode: str) -> SlabRef:
+    """
+    工作进程中执行：解密 src 块中的像素并写入 dst_name 块，返回结果的描述符
+    与 ImageDecoder._run_plan 对非调色板图像的处理相同
+    """
+    plan = compile_plan(params)
+    if plan is None:
+        raise ValueError(f"未知模式: {params.mode}")
+    kernel = functools.partial(plan.kernel, alpha=image_mode in ALPHA_MODES)
+    src_slab, dst_slab = attach(src.name), attach(dst_name)
+    try:
+        pixels = src.view(src_slab)
+        result = SlabRef(dst_name, (pixels.shape[0],) + kernel(pixels[:1], *plan.args).shape[1:],
+                         'uint8')
+        kernel(pixels, *plan.args, out=result.view(dst_slab))
+        del pixels
+        return result
+    finally:
+        for slab in (src_slab, dst_slab):
+            try:
+                slab.close()
+            except BufferError:
+                # 异常的回溯仍引用视图时，映射随其回收
+                pass
+
+
+class _WorkerOutput(io.TextIOBase):
+    """非 verbose 模式下丢弃流水线线程的输出，主线程的进度输出不受影响"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, text):
+        if threading.current_thread().name.startswith(THREAD_PREFIX):
+            return len(text)
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+class _Stage:
+    """
+    一段线程组：从 inbox 取帧、处理后放入 outbox
+    处理失败时由 discard 释放帧占用的资源；已失败的帧不再处理，直接向下游传递；
+    收到结束标记（None）的线程将其放回供同组其他线程使用，最后一个线程向下游发送结束标记
+    """
+
+    def __init__(self, name: str, work: Callable[[_Frame], None], workers: int,
+                 inbox: "queue.Queue", outbox: "queue.Queue", capacity: int,
+                 discard: Callable[[_Frame], None]):
+        self.name = name
+        self.work = work
+        self.discard = discard
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stats = StageStats(name, workers, capacity)
+        self._lock = threading.Lock()
+        self._running = workers
+        self._threads = [threading.Thread(target=self._run, name=f'{THREAD_PREFIX}{name}-{i}',
+                                          daemon=True)
+                         for i in range(workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        stats = self.stats
+        while True:
+            depth = self.inbox.qsize()
+            waited = time.perf_counter()
+            frame = self.inbox.get()
+            waited = time.perf_counter() - waited
+            if frame is None:
+                self.inbox.put(None)
+                with self._lock:
+                    self._running -= 1
+                    last = self._running == 0
+                if last:
+                    self.outbox.put(None)
+                return
+
+            busy = time.perf_counter()
+            if frame.result.error is None:
+                try:
+                    self.work(frame)
+                except Exception as e:
+                    frame.result.error = f"{type(e).__name__}: {e}"
+                    self.discard(frame)
+            busy = time.perf_counter() - busy
+
+            blocked = time.perf_counter()
+            self.outbox.put(frame)
+            blocked = time.perf_counter() - blocked
+
+            with self._lock:
+                stats.items += 1
+                stats.failed += frame.result.error is not None
+                stats.busy += busy
+                stats.starved += waited
+                stats.blocked += blocked
+                stats.depth_total += depth
+                stats.depth_samples += 1
+                stats.depth_max = max(stats.depth_max, depth)
+
+
+def run_pipeline(tasks: Sequence[Tuple[str, str]], config: PipelineConfig = PipelineConfig(),
+                 manual_params: Optional[Dict] = None, verbose: bool = False,
+                 progress=None, search: bool = False, trace: Optional[str] = None,
+                 options: SaveOptions = DEFAULT_SAVE_OPTIONS
+                 ) -> Tuple[List[FileResult], List[StageStats], float]:
+    """
+    以三段流水线解密 tasks 中的 (源文件, 输出文件)
+    progress(结果) 在调用线程中按完成顺序调用；
+    返回 (结果列表, 各段统计, 总耗时秒数)
+    """
+    sink: Sink = JsonLinesSink(trace) if trace else NULL_SINK
+    executor = slabs = None
+    if config.processes:
+        # 每帧至多同时占用输入、输出两块；块池须先于工作进程创建
+        slabs = SlabPool(2 * config.max_frames)
+        executor = ProcessPoolExecutor(max_workers=config.decoders)
+        # 在启动各段线程之前创建工作进程（fork 时不复制其他线程持有的锁）
+        executor.submit(int).result()
+
+    def read(frame: _Frame):
+        frame.start = time.perf_counter()
+        # eager：在读取段中完成像素解压，解密段只做变换
+        decoder = ImageDecoder(sink=sink)
+        if not decoder.load_image(frame.source, resident='eager'):
+            raise IOError("无法加载图像")
+        width, height = decoder.encrypted_image.size
+        frame.result.megapixels = width * height / 1e6
+        frame.params = resolve_params(decoder, frame.manual_params, search)
+        frame.result.mode = frame.params.mode
+        frame.image_mode = decoder.encrypted_image.mode
+        if slabs is None or frame.image_mode in ('P', 'PA'):
+            # 调色板图像需要调色板信息，在本进程中解密（只变换调色板，开销很小）
+            frame.decoder = decoder
+            return
+        pixels = decoder.build_resident_source().raw
+        frame.slab = slabs.acquire(pixels.nbytes)
+        frame.ref = SlabRef(frame.slab.name, pixels.shape, pixels.dtype.str)
+        frame.ref.view(frame.slab)[...] = pixels
+        decoder.unload()
+
+    def decode(frame: _Frame):
+        if frame.decoder is None:
+            decode_in_process(frame)
+            return
+        decoder, frame.decoder = frame.decoder, None
+        frame.image = decoder.decrypt(frame.params, output=output_form(frame.output, options))
+        # 源像素不再需要，尽早释放
+        decoder.unload()
+        if frame.image is None:
+            raise ValueError(f"解密失败（模式: {frame.params.mode}）")
+
+    def decode_in_process(frame: _Frame):
+        # 结果至多4个uint8通道（RGB + alpha）
+        height, width = frame.ref.shape[:2]
+        target = slabs.acquire(height * width * 4)
+        try:
+            ref = executor.submit(_decode_slab, frame.ref, target.name, frame.params,
+                                  frame.image_mode).result()
+        except Exception:
+            slabs.release(target)
+            raise
+        slabs.release(frame.slab)
+        frame.slab, frame.ref = target, ref
+
+    def write(frame: _Frame):
+        os.makedirs(os.path.dirname(frame.output) or '.', exist_ok=True)
+        if frame.ref is not None:
+            save_image(frame.ref.view(frame.slab), frame.output, options, sink, frame.params.mode)
+            slabs.release(frame.slab)
+            frame.slab = frame.ref = None
+        else:
+            image, frame.image = frame.image, None
+            save_image(image, frame.output, options, sink, frame.params.mode)
+        frame.result.output = frame.output
+
+    def discard(frame: _Frame):
+        """失败的帧：归还占用的共享内存块，释放图像"""
+        if frame.slab is not None:
+            slabs.release(frame.slab)
+        frame.decoder = frame.image = frame.ref = frame.slab = None
+
+    tasks_queue: "queue.Queue" = queue.Queue()
+    queues = [tasks_queue] + [queue.Queue(maxsize=config.queue_size) for _ in range(2)]
+    done: "queue.Queue" = queue.Queue()
+    stages = [_Stage(name, work, workers, inbox, outbox, capacity, discard)
+              for name, work, workers, inbox, outbox, capacity in zip(
+                  STAGE_NAMES, (read, decode, write), config.workers,
+                  queues, queues[1:] + [done], (0, config.queue_size, config.queue_size))]
+
+    results: List[FileResult] = []
+    start = time.perf_counter()
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(
+        _WorkerOutput(sys.stdout))
+    with log:
+        for src, dst in tasks:
+            tasks_queue.put(_Frame(src, dst, manual_params, FileResult(source=src)))
+        tasks_queue.put(None)
+        for stage in stages:
+            stage.start()
+        try:
+            while True:
+                frame = done.get()
+                if frame is None:
+                    break
+                result = frame.result
+                # 从开始读取到写出完成，包括在段间队列中等待的时间
+                result.seconds = time.perf_counter() - frame.start if frame.start else 0.0
+                sink.event('file', mode=result.mode, path=result.source, seconds=result.seconds,
+                           megapixels=result.megapixels, error=result.error)
+                results.append(result)
+                if progress:
+                    progress(result)
+        finally:
+            for stage in stages:
+                stage.join()
+            if executor is not None:
+                executor.shutdown()
+                slabs.close()
+    elapsed = time.perf_counter() - start
+
+    for stage in stages:
+        s = stage.stats
+        sink.event('pipeline', step=s.name, workers=s.workers, items=s.items,
+                   busy=s.busy, starved=s.starved, blocked=s.blocked,
+                   mean_depth=s.mean_depth, max_depth=s.depth_max)
+    if slabs is not None:
+        sink.event('slab_pool', created=slabs.created, reused=slabs.reused,
+                   peak_bytes=slabs.peak_bytes)
+    sink.close()
+    return results, [stage.stats for stage in stages], elapsed
+
+
+def format_stage_stats(stats: Sequence[StageStats], elapsed: float) -> str:
+    """各段的线程数、利用率、饥饿/背压时间和输入队列深度"""
+    lines = [f"{'段':8s} {'线程':>4s} {'文件':>6s} {'处理 s':>9s} {'利用率':>7s} "
+             f"{'等待输入 s':>10s} {'等待下游 s':>10s} {'队列均值':>8s} {'最大':>5s} {'容量':>5s}"]
+    for s in stats:
+        capacity = str(s.capacity) if s.capacity else '-'
+        lines.append(f"{s.name:8s} {s.workers:4d} {s.items:6d} {s.busy:9.2f} "
+                     f"{s.utilization(elapsed) * 100:6.1f}% {s.starved:10.2f} {s.blocked:10.2f} "
+                     f"{s.mean_depth:8.2f} {s.depth_max:5d} {capacity:>5s}")
+    return '\n'.join(lines)
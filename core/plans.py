@@ -0,0 +1,222 @@
+"""
+解密计划
+DecryptionParams 只规范化一次，编译为不可变、可哈希的解密计划：
+包含变换内核及其参数（查找表按源数据位深构建并缓存），之后可直接执行。
+各模式通过策略注册表编译，新增策略无需修改解密器的分派逻辑
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from .lut import MAX_LSB_BITS, smart_lsb_bits, apply_lsb, apply_default_mode
+from .params import DecryptionParams
+from .result_cache import params_key
+
+# 默认参数（与历史版本一致）
+DEFAULT_CHANNEL_BITS = {'R': 2, 'G': 3, 'B': 4}
+DEFAULT_BIT_RANGE = {'min': 1, 'max': 5}
+
+
+@dataclass(frozen=True)
+class DecodePlan:
+    """
+    编译后的解密计划
+    key 为规范化后的参数，key 相同的计划产生完全相同的结果；
+    kernel(src, *args, alpha=False, out=None) 为逐像素变换内核，
+    src 可为8位或16位的单通道/多通道数组，alpha 为True时最后一个通道原样透传
+    """
+    key: Tuple
+    kernel: Callable[..., np.ndarray] = field(default=apply_lsb, compare=False)
+    args: Tuple = field(default=(), compare=False)
+    mode: str = field(default='', compare=False)
+    notes: Tuple[str, ...] = field(default=(), compare=False)
+
+    def run(self, img_array: np.ndarray, alpha: bool = False,
+            out: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.kernel(img_array, *self.args, alpha=alpha, out=out)
+
+
+def lsb_plan(bits: int, mode: str = 'simple_lsb', notes: Tuple[str, ...] = ()) -> DecodePlan:
+    """所有通道使用同一位数的LSB计划（8位图像最多8位，16位图像最多16位）"""
+    bits = max(1, min(MAX_LSB_BITS, int(bits)))
+    return DecodePlan(('lsb', bits), apply_lsb, (bits,), mode, notes)
+
+
+def channel_plan(channel_bits: Dict[str, int], mode: str = 'channel_lsb',
+                 notes: Tuple[str, ...] = ()) -> DecodePlan:
+    """RGB逐通道位数的LSB计划（灰度图像的单个通道展开为RGB）"""
+    bits = tuple(max(1, min(MAX_LSB_BITS, int(channel_bits.get(name, default))))
+                 for name, default in DEFAULT_CHANNEL_BITS.items())
+    return DecodePlan(('channel',) + bits, apply_lsb, (bits,), mode, notes)
+
+
+def smart_plan(bit_range: Dict[str, int], threshold: float, mode: str = 'smart_lsb',
+               notes: Tuple[str, ...] = ()) -> DecodePlan:
+    """智能LSB等价于其有效位数的LSB计划"""
+    bits = smart_lsb_bits(bit_range.get('min', 1), bit_range.get('max', 5), threshold)
+    return lsb_plan(bits, mode, notes)
+
+
+def default_plan(mode_type: str, boundary: int, brightness: int,
+                 mode: str = 'default') -> DecodePlan:
+    """默认模式（色阶映射）计划"""
+    return DecodePlan(('default', mode_type, boundary, brightness), apply_default_mode,
+                      (mode_type, boundary, brightness), mode)
+
+
+def normalize_channel_bits(data: Dict) -> Dict[str, int]:
+    """通道位数（支持新格式 channel_bits 和旧格式 r_bits/R 等）"""
+    if isinstance(data.get('channel_bits'), dict):
+        return data['channel_bits']
+    return {
+        'R': data.get('r_bits', data.get('R', DEFAULT_CHANNEL_BITS['R'])),
+        'G': data.get('g_bits', data.get('G', DEFAULT_CHANNEL_BITS['G'])),
+        'B': data.get('b_bits', data.get('B', DEFAULT_CHANNEL_BITS['B'])),
+    }
+
+
+def normalize_bit_range(data: Dict) -> Dict[str, int]:
+    """位数范围（支持新格式 bit_range 和旧格式 min_bits/max_bits）"""
+    if isinstance(data.get('bit_range'), dict):
+        return data['bit_range']
+    return {
+        'min': data.get('min_bits', DEFAULT_BIT_RANGE['min']),
+        'max': data.get('max_bits', DEFAULT_BIT_RANGE['max']),
+    }
+
+
+@dataclass(frozen=True)
+class Strategy:
+    """
+    注册的解密策略
+    from_params: 由顶层 DecryptionParams 编译计划
+    from_strategy_params: 作为自适应模式的子策略时，由 strategy_params 字典编译计划
+    """
+    name: str
+    from_params: Callable[[DecryptionParams], DecodePlan]
+    from_strategy_params: Optional[Callable[[Dict, str], DecodePlan]] = None
+
+
+STRATEGIES: Dict[str, Strategy] = {}
+
+_plans: Dict[str, Optional[DecodePlan]] = {}
+_plans_lock = threading.Lock()
+_MAX_PLANS = 4096
+_plan_stats = {'hits': 0, 'misses': 0}
+
+
+def clear_plan_cache():
+    with _plans_lock:
+        _plans.clear()
+
+
+def register_strategy(name: str, from_params: Callable[[DecryptionParams], DecodePlan],
+                      from_strategy_params: Optional[Callable[[Dict, str], DecodePlan]] = None):
+    """注册（或替换）解密策略，并清空已编译的计划"""
+    STRATEGIES[name] = Strategy(name, from_params, from_strategy_params)
+    clear_plan_cache()
+
+
+# ---- 内置策略（缺省值处理与历史版本的分派逻辑保持一致） ----
+
+register_strategy(
+    'default',
+    lambda p: default_plan(p.mode_type or 'light', p.boundary or 128, p.brightness or 55))
+
+register_strategy(
+    'simple_lsb',
+    lambda p: lsb_plan(p.bits or 2),
+    lambda sp, mode: lsb_plan(sp.get('bits', 2), mode))
+
+register_strategy(
+    'channel_lsb',
+    lambda p: channel_plan(p.channel_bits or DEFAULT_CHANNEL_BITS),
+    lambda sp, mode: channel_plan(normalize_channel_bits(sp), mode))
+
+register_strategy(
+    'smart_lsb',
+    lambda p: smart_plan(p.bit_range or DEFAULT_BIT_RANGE, p.threshold or 0.5),
+    lambda sp, mode: smart_plan(normalize_bit_range(sp), sp.get('threshold', 0.5), mode))
+
+
+def adaptive_plan(threshold: float = 0.5, strategy: Optional[str] = None,
+                  strategy_params: Optional[Dict] = None,
+                  decryption_guide: Optional[Dict] = None) -> DecodePlan:
+    """
+    自适应模式：解析出具体策略后编译为该策略的计划
+    策略信息不完整时按解密指导或阈值推断（向后兼容旧版本）
+    """
+    notes = []
+    if not strategy or not strategy_params:
+        if decryption_guide:
+            strategy = decryption_guide.get('strategy', 'simple_lsb')
+            notes.append(f"策略信息不完整，从解密指导获取策略: {strategy}")
+        elif threshold < 0.3:
+            strategy, strategy_params = 'simple_lsb', {'bits': 2, 'strength': 1.0}
+        elif threshold < 0.7:
+            strategy, strategy_params = 'channel_lsb', {'channel_bits': dict(DEFAULT_CHANNEL_BITS),
+                                                        'quality': 0.8}
+        else:
+            strategy, strategy_params = 'smart_lsb', {'bit_range': dict(DEFAULT_BIT_RANGE),
+                                                      'threshold': threshold, 'edge_protect': True}
+        if not decryption_guide:
+            notes.append(f"策略信息不完整，按阈值推断策略: {strategy}")
+
+    entry = STRATEGIES.get(strategy)
+    if entry is None or entry.from_strategy_params is None:
+        notes.append(f"未知策略 '{strategy}'，使用默认简单LSB")
+        return lsb_plan(2, 'adaptive', tuple(notes))
+    if strategy_params is None:
+        notes.append("策略参数缺失，使用默认简单LSB")
+        return lsb_plan(2, 'adaptive', tuple(notes))
+    try:
+        plan = entry.from_strategy_params(strategy_params, 'adaptive')
+    except (TypeError, ValueError, AttributeError) as e:
+        notes.append(f"策略参数无效（{e}），使用默认简单LSB")
+        return lsb_plan(2, 'adaptive', tuple(notes))
+    return DecodePlan(plan.key, plan.kernel, plan.args, 'adaptive',
+                      plan.notes + tuple(notes))
+
+
+register_strategy(
+    'adaptive',
+    lambda p: adaptive_plan(p.threshold or 0.5, p.selected_strategy, p.strategy_params,
+                            p.decryption_guide))
+
+
+def compile_plan(params: DecryptionParams) -> Optional[DecodePlan]:
+    """
+    编译解密计划（按规范化参数缓存，重复编译直接返回同一对象）
+    未知模式返回None
+    """
+    key = params_key(params)
+    with _plans_lock:
+        if key in _plans:
+            _plan_stats['hits'] += 1
+            return _plans[key]
+
+    entry = STRATEGIES.get(params.mode)
+    plan = entry.from_params(params) if entry is not None else None
+
+    with _plans_lock:
+        if len(_plans) >= _MAX_PLANS:
+            _plans.clear()
+        _plans[key] = plan
+        _plan_stats['misses'] += 1
+    return plan
+
+
+def plan_cache_stats() -> Dict[str, int]:
+    """本进程内计划缓存的命中/编译次数"""
+    with _plans_lock:
+        return dict(_plan_stats, entries=len(_plans))
+
+
+def plan_label(plan: Optional[DecodePlan]) -> str:
+    """计划的简短可读标识，如 lsb:3、channel:2,3,4"""
+    if plan is None:
+        return 'none'
+    return f"{plan.key[0]}:" + ','.join(str(v) for v in plan.key[1:])
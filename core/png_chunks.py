@@ -0,0 +1,85 @@
+"""
+PNG数据块底层读写工具
+"""
+
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# 文本块类型
+TEXT_CHUNKS = (b'tEXt', b'zTXt', b'iTXt')
+
+
+def read_chunk_header(f: BinaryIO) -> Tuple[int, bytes]:
+    """读取数据块头（长度, 类型）"""
+    header = f.read(8)
+    if len(header) < 8:
+        raise ValueError("PNG文件不完整")
+    length, chunk_type = struct.unpack('>I4s', header)
+    return length, chunk_type
+
+
+def make_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """构造带CRC的PNG数据块"""
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def decode_text_chunk(chunk_type: bytes, data: bytes) -> Tuple[str, str]:
+    """解析 tEXt/zTXt/iTXt 数据块，返回 (关键字, 文本)"""
+    key, _, rest = data.partition(b'\x00')
+    keyword = key.decode('latin-1')
+
+    if chunk_type == b'tEXt':
+        return keyword, rest.decode('latin-1', 'replace')
+
+    if chunk_type == b'zTXt':
+        # 压缩方法(1字节) + zlib数据
+        return keyword, zlib.decompress(rest[1:]).decode('latin-1', 'replace')
+
+    # iTXt: 压缩标志、压缩方法、语言标签\0、翻译关键字\0、UTF-8文本
+    compressed = rest[0]
+    _, _, rest = rest[2:].partition(b'\x00')
+    _, _, text = rest.partition(b'\x00')
+    if compressed:
+        text = zlib.decompress(text)
+    return keyword, text.decode('utf-8')
+
+
+def read_text_chunks(filepath: str, keys: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    读取PNG文本元数据
+    只扫描到第一个IDAT块为止，不解压任何像素数据；
+    指定 keys 时只解码这些关键字（找齐后提前结束）
+    """
+    wanted = set(keys) if keys is not None else None
+    texts: Dict[str, str] = {}
+
+    with open(filepath, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError("不是PNG文件")
+        while True:
+            length, chunk_type = read_chunk_header(f)
+            if chunk_type in (b'IDAT', b'IEND'):
+                break
+            if chunk_type not in TEXT_CHUNKS:
+                f.seek(length + 4, 1)
+                continue
+
+            data = f.read(length)
+            f.seek(4, 1)  # CRC
+            if wanted is not None:
+                key = data.split(b'\x00', 1)[0].decode('latin-1')
+                if key not in wanted:
+                    continue
+            try:
+                key, value = decode_text_chunk(chunk_type, data)
+            except (zlib.error, UnicodeDecodeError, IndexError):
+                continue
+            texts.setdefault(key, value)
+            if wanted is not None and wanted.issubset(texts):
+                break
+
+    return texts
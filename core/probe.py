@@ -0,0 +1,79 @@
+"""
+元数据快速探测
+只扫描PNG文本块（到第一个IDAT为止），不解码像素，
+用于在解密前对大量文件按模式分拣
+用法: python -m core.probe 目录或文件...
+"""
+
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .decoder import ImageDecoder
+from .params import DecryptionParams
+from .png_chunks import read_text_chunks
+
+# auto_detect_params 需要的文本关键字
+METADATA_KEYS = ('Steganography_mode', 'Steganography_parameters', 'Software')
+
+
+def probe_metadata(filepath: str) -> Dict:
+    """读取隐写元数据（与 ImageDecoder.load_image 的结果一致）"""
+    try:
+        texts = read_text_chunks(filepath, METADATA_KEYS)
+    except (OSError, ValueError):
+        return {}
+    return ImageDecoder.parse_metadata(texts)
+
+
+def probe(filepath: str) -> Optional[DecryptionParams]:
+    """探测单个文件的解密参数，无元数据时返回None"""
+    decoder = ImageDecoder()
+    decoder.metadata = probe_metadata(filepath)
+    return decoder.auto_detect_params()
+
+
+def probe_many(paths: Iterable[str], workers: int = 8) -> List[Tuple[str, Optional[DecryptionParams]]]:
+    """
+    批量探测，按输入顺序返回 (路径, 参数)
+    探测以文件IO为主，使用线程池并发
+    """
+    paths = list(paths)
+    if workers <= 1 or len(paths) < 2:
+        return [(path, probe(path)) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(zip(paths, pool.map(probe, paths)))
+
+
+def group_by_mode(results: Iterable[Tuple[str, Optional[DecryptionParams]]]) -> Dict[str, List[str]]:
+    """按加密模式分组（无元数据的文件归入 'none'）"""
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for path, params in results:
+        groups[params.mode if params else 'none'].append(path)
+    return dict(groups)
+
+
+def main(argv=None) -> int:
+    from .batch import iter_images
+
+    targets = argv if argv is not None else sys.argv[1:]
+    if not targets:
+        print("用法: python -m core.probe 目录或文件...", file=sys.stderr)
+        return 2
+
+    paths = []
+    for target in targets:
+        paths.extend(iter_images(target) if os.path.isdir(target) else [target])
+
+    groups = group_by_mode(probe_many(paths))
+    for mode, files in sorted(groups.items()):
+        print(f"[{mode}] {len(files)} 个文件")
+        for path in files:
+            print(f"  {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+常驻源数据
+每个已加载图像只读取一次像素：保存只读的原始像素数组，各模式的解密直接在其上查表
+（查表内核取代了原先按位拆分的位平面，这里不再保存位平面）
+"""
+
+from typing import Optional
+import numpy as np
+from PIL import Image
+
+# 直接读取像素解密的图像模式（P/PA 解密调色板），其他模式先转换
+NATIVE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'P', 'PA', 'I', 'I;16', 'I;16L', 'I;16B', 'I;16N')
+
+# 最后一个通道为alpha（解密时原样透传）的模式
+ALPHA_MODES = ('LA', 'RGBA', 'PA')
+
+
+def decode_source(image: Image.Image) -> Image.Image:
+    """转换为可直接解密的模式（单通道转为L，CMYK/YCbCr 等转为RGB或RGBA）"""
+    if image.mode in NATIVE_MODES:
+        return image
+    bands = image.getbands()
+    if len(bands) == 1:
+        return image.convert('L')
+    return image.convert('RGBA' if 'A' in bands else 'RGB')
+
+
+class ResidentSource:
+    """已加载图像的只读源数据"""
+
+    def __init__(self, image: Image.Image, raw: Optional[np.ndarray] = None):
+        self.image = image
+        # 原始像素（保留16位等原始类型）；raw 可传入另行读取的像素（如16位彩色PNG）
+        self.raw = raw if raw is not None else np.asarray(decode_source(image))
+        self.raw.flags.writeable = False
+
+    def matches(self, image: Image.Image) -> bool:
+        """缓存是否属于该图像对象"""
+        return self.image is image
+
+    @property
+    def nbytes(self) -> int:
+        return self.raw.nbytes
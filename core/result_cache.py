@@ -0,0 +1,112 @@
+"""
+解密结果缓存
+按 (源图像内容摘要, 解密计划键, 返回形式) 缓存解密结果（键由 ResultCache.make_key 构造），
+在字节预算内按LRU淘汰
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .params import DecryptionParams
+
+
+def image_digest(image: Image.Image, pixels: Optional[np.ndarray] = None) -> str:
+    """
+    源图像内容摘要（模式、尺寸和像素数据）
+    pixels 为已读取的像素数组（如常驻源数据）时直接对其缓冲区计算，不复制像素
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{image.mode}:{image.size}".encode())
+    if image.mode == 'P':
+        h.update(bytes(image.getpalette() or []))
+    if pixels is not None:
+        h.update(f"{pixels.dtype}:{pixels.shape}".encode())
+        h.update(memoryview(np.ascontiguousarray(pixels)).cast('B'))
+    else:
+        h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def params_key(params: DecryptionParams) -> str:
+    """参数的规范化可哈希形式（字段排序后的JSON）"""
+    return json.dumps(asdict(params), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def image_nbytes(image) -> int:
+    """图像（或数组）像素数据占用的字节数（估算）"""
+    if isinstance(image, np.ndarray):
+        return image.nbytes
+    width, height = image.size
+    return width * height * len(image.getbands()) * (2 if ';16' in image.mode else 1)
+
+
+class ResultCache:
+    """线程安全的LRU解密结果缓存（值为PIL图像或NumPy数组）"""
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(digest: str, plan_key: Hashable, output: str) -> Tuple[str, Hashable, str]:
+        """
+        缓存键：以解密计划的规范化参数为键，等价参数（如同位数的simple/smart）共享缓存；
+        图像与数组两种返回形式分别缓存
+        """
+        return digest, plan_key, output
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, image):
+        size = image_nbytes(image)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (image, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中/淘汰计数及当前占用"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
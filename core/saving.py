@@ -0,0 +1,182 @@
+"""
+解密结果写出
+支持可调的PNG压缩级别与zlib策略，以及快速无损格式：
+无压缩TIFF、原始 .npy 数组和低压缩强度的无损WebP。
+AsyncSaver 在后台写出线程中按有界队列顺序保存，GUI与批量解密共用
+"""
+
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from .instrument import Sink, NULL_SINK, STAGE_ENCODE
+
+# 格式 -> 默认扩展名
+SAVE_FORMATS = {
+    'png': '.png',
+    'tiff': '.tif',
+    'npy': '.npy',
+    'webp': '.webp',
+}
+
+# 扩展名 -> 格式（未列出的扩展名交给PIL按扩展名处理）
+_EXTENSION_FORMATS = {
+    '.png': 'png',
+    '.tif': 'tiff',
+    '.tiff': 'tiff',
+    '.npy': 'npy',
+    '.webp': 'webp',
+}
+
+# PNG的zlib压缩策略（PIL的 compress_type）
+PNG_STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'huffman': zlib.Z_HUFFMAN_ONLY,
+    'rle': zlib.Z_RLE,
+    'fixed': zlib.Z_FIXED,
+}
+
+# 写出队列的默认容量（已解密、等待写出的图像数）
+SAVE_QUEUE_SIZE = 4
+
+
+@dataclass(frozen=True)
+class SaveOptions:
+    """
+    写出选项
+    format 为None时按扩展名选择；compress_level 为PNG的zlib级别（0-9，
+    1 通常比默认的6快数倍而体积相近）；strategy 为PNG的zlib策略；
+    webp_effort 为无损WebP的压缩强度（0最快，100最小）
+    """
+    format: Optional[str] = None
+    compress_level: int = 6
+    strategy: str = 'default'
+    webp_effort: int = 0
+
+
+DEFAULT_SAVE_OPTIONS = SaveOptions()
+
+
+def save_format(filepath: str, options: SaveOptions = DEFAULT_SAVE_OPTIONS) -> Optional[str]:
+    """实际使用的格式；None 表示交给PIL按扩展名处理（如JPEG/BMP）"""
+    if options.format:
+        if options.format not in SAVE_FORMATS:
+            raise ValueError(f"未知的保存格式: {options.format}")
+        return options.format
+    return _EXTENSION_FORMATS.get(os.path.splitext(filepath)[1].lower())
+
+
+def save_image(image: Union[Image.Image, np.ndarray], filepath: str,
+               options: SaveOptions = DEFAULT_SAVE_OPTIONS, sink: Sink = NULL_SINK,
+               mode: Optional[str] = None) -> str:
+    """
+    按选项写出图像或uint8数组（.npy 直接写出数组，不构造PIL图像）
+    sink 接收写出（encode）事件；返回使用的格式
+    """
+    fmt = save_format(filepath, options)
+    with sink.stage(STAGE_ENCODE, mode=mode, format=fmt or 'auto') as span:
+        if fmt == 'npy':
+            if isinstance(image, Image.Image) and image.mode in ('P', 'PA'):
+                # 调色板图像展开为颜色值（与 decrypt(output='array') 一致），不写出索引
+                transparent = (image.mode == 'PA' or 'transparency' in image.info
+                               or (image.palette is not None and image.palette.mode == 'RGBA'))
+                image = image.convert('RGBA' if transparent else 'RGB')
+            array = np.asarray(image)
+            np.save(filepath, array)
+            span.nbytes = array.nbytes
+            return fmt
+
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        if fmt == 'png':
+            if options.strategy not in PNG_STRATEGIES:
+                raise ValueError(f"未知的PNG压缩策略: {options.strategy}")
+            image.save(filepath, format='PNG', compress_level=options.compress_level,
+                       compress_type=PNG_STRATEGIES[options.strategy])
+        elif fmt == 'tiff':
+            image.save(filepath, format='TIFF', compression='raw')
+        elif fmt == 'webp':
+            image.save(filepath, format='WEBP', lossless=True,
+                       quality=options.webp_effort, method=0)
+        else:
+            image.save(filepath)
+        span.nbytes = image.width * image.height * len(image.getbands())
+    return fmt or 'auto'
+
+
+class AsyncSaver:
+    """
+    后台写出线程
+    submit 将图像放入有界队列后立即返回 Future；队列满时阻塞调用方，
+    解密速度超过写出速度时内存占用不会无限增长
+    """
+
+    def __init__(self, options: SaveOptions = DEFAULT_SAVE_OPTIONS,
+                 queue_size: int = SAVE_QUEUE_SIZE, sink: Sink = NULL_SINK):
+        self.options = options
+        self.sink = sink
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = threading.Thread(target=self._run, name='saver', daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    def submit(self, image: Union[Image.Image, np.ndarray], filepath: str,
+               options: Optional[SaveOptions] = None, sink: Optional[Sink] = None,
+               mode: Optional[str] = None,
+               callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        排队写出；返回的 Future 结果为使用的格式，写出失败时为异常
+        callback 在写出线程中、Future 完成后调用
+        """
+        if self._closed:
+            raise RuntimeError("写出线程已关闭")
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        self._queue.put((future, image, filepath, options or self.options,
+                         sink if sink is not None else self.sink, mode))
+        return future
+
+    @property
+    def pending(self) -> int:
+        """排队中的写出数"""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            future, image, filepath, options, sink, mode = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(save_image(image, filepath, options, sink, mode))
+                except Exception as e:
+                    future.set_exception(e)
+            self._queue.task_done()
+
+    def flush(self):
+        """等待已排队的写出全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """写完已排队的图像后结束写出线程"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,213 @@
+"""
+无元数据时的参数暴力搜索
+枚举全部候选参数，先在降采样代理图上用快速"自然度"评分排序，
+再对领先候选在更高分辨率上复评，返回前 top_k 个参数
+"""
+
+import hashlib
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .lut import check_cancelled
+from .params import DecryptionParams
+from .plans import compile_plan
+
+# 搜索空间
+SEARCH_MODES = ('simple_lsb', 'channel_lsb', 'smart_lsb', 'default')
+SMART_THRESHOLDS = (0.0, 0.25, 0.5, 0.75, 1.0)
+DEFAULT_BOUNDARIES = tuple(range(16, 256, 16))
+
+# 代理图和复评图的像素上限
+PROXY_PIXELS = 256 * 1024
+REFINE_PIXELS = 16 * 1024 * 1024
+
+
+@dataclass
+class SearchResult:
+    """搜索候选及其评分"""
+    params: DecryptionParams
+    score: float
+    proxy_score: float
+
+
+def candidate_space(modes: Iterable[str] = SEARCH_MODES) -> List[DecryptionParams]:
+    """生成搜索空间内的全部候选参数"""
+    modes = set(modes)
+    candidates = []
+    if 'simple_lsb' in modes:
+        candidates += [DecryptionParams(mode='simple_lsb', bits=b) for b in range(1, 9)]
+    if 'channel_lsb' in modes:
+        candidates += [DecryptionParams(mode='channel_lsb', channel_bits={'R': r, 'G': g, 'B': b})
+                       for r, g, b in itertools.product(range(1, 9), repeat=3)]
+    if 'smart_lsb' in modes:
+        candidates += [DecryptionParams(mode='smart_lsb', bit_range={'min': lo, 'max': hi},
+                                        threshold=t, edge_protect=True)
+                       for lo, hi, t in itertools.product(range(1, 4), range(3, 9), SMART_THRESHOLDS)]
+    if 'default' in modes:
+        candidates += [DecryptionParams(mode='default', mode_type=mode_type, boundary=k)
+                       for mode_type, k in itertools.product(('light', 'dark'), DEFAULT_BOUNDARIES)]
+    return candidates
+
+
+def _corr(a: np.ndarray, b: np.ndarray) -> float:
+    """皮尔逊相关系数（方差为0时返回0）"""
+    a = a - a.mean()
+    b = b - b.mean()
+    denom = np.sqrt(float((a * a).sum()) * float((b * b).sum()))
+    return float((a * b).sum()) / denom if denom > 0 else 0.0
+
+
+def _channels(array: np.ndarray) -> List[np.ndarray]:
+    """拆分颜色通道（忽略alpha）"""
+    if array.ndim == 2:
+        return [array]
+    return [array[:, :, c] for c in range(min(3, array.shape[2]))]
+
+
+def channel_naturalness(decoded: np.ndarray, source: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    逐通道的快速图像自然度评分（0~1，越大越像自然图像）
+    - 自然图像相邻像素高度相关，错误位数解出的噪声几乎不相关
+    - 单一取值占一半以上（裁剪、全黑）时降低评分
+    - 与源通道高度相关的结果只是载体图本身，降低评分
+    """
+    sources = _channels(source) if source is not None else None
+    scores = []
+    for c, channel in enumerate(_channels(decoded)):
+        x = channel.astype(np.float32)
+        if x.shape[0] < 2 or x.shape[1] < 2 or x.std() < 1.0:
+            scores.append(0.0)
+            continue
+        score = max(0.0, (_corr(x[:, :-1], x[:, 1:]) + _corr(x[:-1], x[1:])) / 2)
+        dominant = np.bincount(channel.reshape(-1), minlength=256).max() / channel.size
+        score *= 1.0 - max(0.0, dominant - 0.5) * 2
+        if sources is not None:
+            score *= 1.0 - max(0.0, _corr(x, sources[c].astype(np.float32)))
+        scores.append(score)
+    return np.array(scores)
+
+
+def naturalness(decoded: np.ndarray, source: Optional[np.ndarray] = None) -> float:
+    """图像自然度评分（各通道平均）"""
+    return float(channel_naturalness(decoded, source).mean())
+
+
+def _downsample(image: Image.Image, max_pixels: int) -> Image.Image:
+    """
+    最近邻抽样降采样
+    LSB解密是逐像素映射，抽样后解密与解密后抽样结果一致，
+    而均值类缩放会破坏低位数据
+    """
+    width, height = image.size
+    if width * height <= max_pixels:
+        return image
+    ratio = (max_pixels / (width * height)) ** 0.5
+    size = (max(2, int(width * ratio)), max(2, int(height * ratio)))
+    return image.resize(size, Image.Resampling.NEAREST)
+
+
+class _Scorer:
+    """
+    在一幅图像上为候选参数评分
+    所有LSB候选都可由逐通道的 simple_lsb 结果组合得到：
+    smart_lsb 的解密计划即其有效位数的 simple_lsb，channel_lsb 的每个通道
+    等价于RGB图像对应通道的 simple_lsb。因此只需实际解密少量基础变换
+    """
+
+    def __init__(self, image: Image.Image, workers: int):
+        image.load()
+        self.image = image
+        self.rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        self.workers = workers
+
+    def _decode(self, image: Image.Image, params: DecryptionParams) -> Tuple[np.ndarray, Optional[str]]:
+        from .decoder import ImageDecoder
+
+        decoder = ImageDecoder()
+        decoder.encrypted_image = image
+        decoded = decoder.decrypt(params, output='array')
+        if decoded is None:
+            return np.zeros(1), None
+        source = np.asarray(image)
+        if source.shape != decoded.shape:
+            source = np.asarray(self.rgb)
+        digest = hashlib.blake2b(decoded.tobytes(), digest_size=16).hexdigest()
+        return channel_naturalness(decoded, source), digest
+
+    def score(self, candidates: List[DecryptionParams]) -> List[Tuple[float, Optional[str]]]:
+        """返回每个候选的 (评分, 结果去重键)"""
+        # 收集需要实际解密的基础变换（按解密计划的规范化参数去重）
+        plans = [compile_plan(params) for params in candidates]
+        jobs = {}
+        for params, plan in zip(candidates, plans):
+            if plan.key[0] == 'lsb':
+                jobs[('native', plan.key[1])] = (self.image, DecryptionParams('simple_lsb', bits=plan.key[1]))
+            elif plan.key[0] == 'channel':
+                for bits in set(plan.key[1:]):
+                    jobs[('rgb', bits)] = (self.rgb, DecryptionParams('simple_lsb', bits=bits))
+            else:
+                jobs.setdefault(plan.key, (self.image, params))
+
+        keys = list(jobs)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            done = dict(zip(keys, pool.map(lambda k: self._decode(*jobs[k]), keys)))
+
+        results = []
+        for plan in plans:
+            if plan.key[0] == 'lsb':
+                scores, digest = done[('native', plan.key[1])]
+            elif plan.key[0] == 'channel':
+                r, g, b = plan.key[1:]
+                scores = np.array([done[('rgb', r)][0][0], done[('rgb', g)][0][1], done[('rgb', b)][0][2]])
+                if r == g == b:
+                    digest = done[('rgb', r)][1]
+                else:
+                    digest = f'channel:{r}{g}{b}'
+            else:
+                scores, digest = done[plan.key]
+            results.append((float(scores.mean()), digest))
+        return results
+
+
+def search_params(image: Image.Image, top_k: int = 5, modes: Iterable[str] = SEARCH_MODES,
+                  proxy_pixels: int = PROXY_PIXELS, refine: int = 4,
+                  refine_pixels: int = REFINE_PIXELS,
+                  workers: Optional[int] = None) -> List[SearchResult]:
+    """
+    暴力搜索解密参数
+    1. 在代理图（约 proxy_pixels 像素）上评估全部候选
+    2. 解密结果完全相同的候选只保留第一个
+    3. 前 top_k * refine 个候选在 refine_pixels 分辨率（通常即原图）上复评
+    """
+    workers = workers or os.cpu_count() or 1
+    candidates = candidate_space(modes)
+
+    proxy = _downsample(image, proxy_pixels)
+    proxy_scores = _Scorer(proxy, workers).score(candidates)
+
+    ranked, seen = [], set()
+    for params, (score, digest) in sorted(zip(candidates, proxy_scores),
+                                          key=lambda item: item[1][0], reverse=True):
+        if digest is None or digest in seen:
+            continue
+        seen.add(digest)
+        ranked.append((params, score))
+
+    leaders = ranked[:max(top_k, top_k * refine)]
+    check_cancelled()
+    full = _downsample(image, refine_pixels)
+    if full is proxy:
+        refined = [score for _, score in leaders]
+    else:
+        refined = [score for score, _ in _Scorer(full, workers).score([p for p, _ in leaders])]
+
+    results = [SearchResult(params=p, score=s, proxy_score=ps)
+               for (p, ps), s in zip(leaders, refined)]
+    results.sort(key=lambda r: r.score, reverse=True)
+    return results[:top_k]
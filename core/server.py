@@ -0,0 +1,364 @@
+"""
+本地HTTP解密服务（asyncio，无第三方依赖）
+用法: python -m core.server [--host 127.0.0.1] [--port 8765] [--workers N] [--queue N]
+
+接口（请求体均为原始图像字节）:
+    POST /probe                  探测元数据，返回JSON
+    POST /decode                 按元数据自动解密，返回PNG（?search=1 无元数据时暴力搜索）
+    POST /decode?params=JSON     使用显式 DecryptionParams 解密（也可放在 X-Decrypt-Params 头）
+    GET  /metrics                请求计数、队列状态和各接口延迟 p50/p95
+    GET  /health
+
+解密在进程池（--threads 时为线程池）中执行；/probe 和 /decode 共用请求名额，
+正在读取请求体、处理和排队的请求达到 workers + queue 时立即返回 503；
+请求体超过 body_timeout 未读完时返回 408 并释放名额。
+解密结果在工作进程中完整编码为PNG后返回，再分块写出（写出时有背压，编码本身不是流式的）
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .batch import params_from_dict
+from .decoder import ImageDecoder
+from .instrument import Event, StatsSink
+
+DEFAULT_PORT = 8765
+
+# 响应分块写出的大小
+_WRITE_CHUNK = 256 * 1024
+
+# 已知接口；其他路径在计数和延迟统计中归入 'other'，避免客户端路径撑大统计
+_ROUTES = ('/probe', '/decode', '/metrics', '/health')
+
+# 每个接口保留的最近延迟记录数（p50/p95 按此窗口计算）
+LATENCY_WINDOW = 1024
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large', 422: 'Unprocessable Entity',
+    500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class HTTPError(Exception):
+    """以指定状态码结束请求"""
+
+    def __init__(self, status: int, message: str):
+        # args 中保留状态码，保证可跨进程传递
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+
+def _open_decoder(data: bytes) -> ImageDecoder:
+    decoder = ImageDecoder()
+    if not decoder.load_image(io.BytesIO(data)):
+        raise HTTPError(400, "无法识别的图像数据")
+    return decoder
+
+
+def probe_bytes(data: bytes) -> Dict:
+    """探测图像字节中的元数据和参数（不解码像素）"""
+    decoder = _open_decoder(data)
+    params = decoder.auto_detect_params()
+    width, height = decoder.encrypted_image.size
+    return {
+        'width': width,
+        'height': height,
+        'image_mode': decoder.encrypted_image.mode,
+        'metadata': decoder.metadata,
+        'params': params.__dict__ if params else None,
+    }
+
+
+def decode_bytes(data: bytes, manual_params: Optional[Dict] = None, search: bool = False,
+                 compress_level: int = 6) -> Tuple[bytes, str]:
+    """
+    解密图像字节并编码为PNG（在工作进程中运行）
+    返回 (PNG字节, 使用的模式)
+    """
+    decoder = _open_decoder(data)
+    if manual_params:
+        params = params_from_dict(manual_params)
+    else:
+        params = decoder.auto_detect_params()
+        if params is None and search:
+            candidates = decoder.search_params(top_k=1, workers=1)
+            params = candidates[0] if candidates else None
+        if params is None:
+            raise ValueError("无法从元数据获取解密参数")
+
+    image = decoder.decrypt(params)
+    if image is None:
+        raise ValueError(f"解密失败（模式: {params.mode}）")
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=compress_level)
+    return buffer.getvalue(), params.mode
+
+
+class DecodeService:
+    """HTTP解密服务，可在同一事件循环中启动/关闭（便于本机测试）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 workers: Optional[int] = None, queue_size: int = 16,
+                 use_threads: bool = False, max_body: int = 256 * 1024 * 1024,
+                 compress_level: int = 6, header_timeout: float = 30.0,
+                 body_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.use_threads = use_threads
+        self.max_body = max_body
+        self.compress_level = compress_level
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+
+        self.executor: Optional[Executor] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.latency = StatsSink(window=LATENCY_WINDOW)
+        self.requests: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._pending = 0
+        self._started = time.time()
+
+    @property
+    def max_pending(self) -> int:
+        return self.workers + self.queue_size
+
+    async def start(self):
+        if self.use_threads:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='decode')
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 时取得实际端口
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._started = time.time()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"解密服务已启动: http://{self.host}:{self.port} "
+              f"(workers={self.workers}, queue={self.queue_size})")
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    def metrics(self) -> Dict:
+        return {
+            'uptime': time.time() - self._started,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': min(self._pending, self.workers),
+            'queued': max(0, self._pending - self.workers),
+            'rejected': self.rejected,
+            'requests': dict(self.requests),
+            'status': {str(code): n for code, n in self.statuses.items()},
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'latency': self.latency.summary(),
+        }
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str]]:
+        line = await reader.readline()
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise HTTPError(400, "无效的请求行")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return parts[0].upper(), parts[1], headers
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str],
+                         keep: bool = True) -> bytes:
+        """读取请求体；keep=False 时只读取并丢弃（拒绝请求前清空连接）"""
+        if 'content-length' not in headers:
+            raise HTTPError(411, "需要 Content-Length")
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HTTPError(400, "无效的 Content-Length")
+        if keep and length > self.max_body:
+            raise HTTPError(413, f"请求体超过上限 {self.max_body} 字节")
+        self.bytes_in += length
+        if keep:
+            return await reader.readexactly(length)
+        while length > 0:
+            chunk = await reader.read(min(length, _WRITE_CHUNK))
+            if not chunk:
+                break
+            length -= len(chunk)
+        return b''
+
+    async def _receive_body(self, reader: asyncio.StreamReader, headers: Dict[str, str],
+                            keep: bool = True) -> bytes:
+        """在 body_timeout 内读取请求体，超时返回 408"""
+        try:
+            return await asyncio.wait_for(self._read_body(reader, headers, keep), self.body_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "读取请求体超时")
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: bytes,
+                       content_type: str = 'application/json; charset=utf-8',
+                       headers: Optional[Dict[str, str]] = None):
+        """
+        写出响应；body 已完整在内存中，分块写出并在每块后等待缓冲区排空（背压），
+        避免慢客户端时把整个响应堆进传输缓冲区
+        """
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        view = memoryview(body)
+        for offset in range(0, len(body), _WRITE_CHUNK):
+            writer.write(view[offset:offset + _WRITE_CHUNK])
+            await writer.drain()
+        await writer.drain()
+        self.statuses[status] += 1
+        self.bytes_out += len(body)
+
+    async def _respond_json(self, writer, status: int, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        await self._respond(writer, status, body, headers=headers)
+
+    async def _run(self, func, *args):
+        """在工作池中执行CPU任务（名额已由 _dispatch 占用）"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        start = time.perf_counter()
+        route = 'invalid'
+        try:
+            try:
+                method, target, headers = await asyncio.wait_for(
+                    self._read_head(reader), self.header_timeout)
+                url = urlsplit(target)
+                route = url.path if url.path in _ROUTES else 'other'
+                query = parse_qs(url.query)
+                await self._dispatch(method, url.path, query, headers, reader, writer)
+            except HTTPError as e:
+                retry = {'Retry-After': '1'} if e.status == 503 else None
+                await self._respond_json(writer, e.status, {'error': e.message}, retry)
+            except asyncio.TimeoutError:
+                pass
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            except Exception as e:
+                await self._respond_json(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            self.requests[route] += 1
+            self.latency.emit(Event(route, time.perf_counter() - start))
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, method: str, path: str, query: Dict, headers: Dict[str, str],
+                        reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if path == '/health':
+            await self._respond_json(writer, 200, {'status': 'ok'})
+            return
+        if path == '/metrics':
+            await self._respond_json(writer, 200, self.metrics())
+            return
+        if path not in ('/probe', '/decode'):
+            raise HTTPError(404, f"未知路径: {path}")
+        if method != 'POST':
+            raise HTTPError(405, "只支持 POST")
+
+        if self._pending >= self.max_pending:
+            # 过载时不缓存请求体，读取丢弃后直接拒绝
+            await self._receive_body(reader, headers, keep=False)
+            self.rejected += 1
+            raise HTTPError(503, "服务繁忙，请稍后重试")
+        # 读取请求体之前占用名额，同时缓存的请求体不超过 max_pending 个
+        self._pending += 1
+        try:
+            data = await self._receive_body(reader, headers)
+            if path == '/probe':
+                await self._respond_json(writer, 200, await self._probe(data))
+            else:
+                await self._decode(data, query, headers, writer)
+        finally:
+            self._pending -= 1
+
+    async def _probe(self, data: bytes) -> Dict:
+        # 探测只读取文本块，在默认线程池中执行即可
+        return await asyncio.get_running_loop().run_in_executor(None, probe_bytes, data)
+
+    async def _decode(self, data: bytes, query: Dict, headers: Dict[str, str],
+                      writer: asyncio.StreamWriter):
+        manual_params = None
+        raw = query.get('params', [headers.get('x-decrypt-params')])[0]
+        if raw:
+            try:
+                manual_params = json.loads(raw)
+                params_from_dict(manual_params)
+            except (ValueError, TypeError) as e:
+                raise HTTPError(422, f"参数无效: {e}")
+        search = query.get('search', ['0'])[0] in ('1', 'true', 'yes')
+
+        try:
+            png, mode = await self._run(decode_bytes, data, manual_params, search,
+                                        self.compress_level)
+        except ValueError as e:
+            raise HTTPError(422, str(e))
+        await self._respond(writer, 200, png, 'image/png', {'X-Decrypt-Mode': mode})
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m core.server', description='本地HTTP解密服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认仅本机）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='解密工作进程数（默认: CPU核心数）')
+    parser.add_argument('-q', '--queue', type=int, default=16,
+                        help='排队请求上限，超出时返回503')
+    parser.add_argument('--threads', action='store_true', help='使用线程池代替进程池')
+    parser.add_argument('--max-body', type=int, default=256, help='请求体上限（MB）')
+    parser.add_argument('--compress-level', type=int, default=6, help='输出PNG压缩级别（0-9）')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    service = DecodeService(args.host, args.port, args.workers, args.queue, args.threads,
+                            args.max_body * 1024 * 1024, args.compress_level)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
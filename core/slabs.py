@@ -0,0 +1,155 @@
+"""
+进程间共享内存帧传输
+主进程维护一组可循环使用的共享内存块（slab），像素数据写入块中，
+进程之间只传递很小的 SlabRef 描述符（块名、形状、类型），
+跨进程开销不随图像大小增长
+"""
+
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# 块大小的取整粒度：大小相近的帧可复用同一块
+SLAB_ALIGN = 1 << 20
+
+
+@dataclass(frozen=True)
+class SlabRef:
+    """共享内存块中一帧像素的描述符（可跨进程传递）"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    def view(self, slab: shared_memory.SharedMemory) -> np.ndarray:
+        """块中的数组视图（不复制）"""
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=slab.buf)
+
+
+# 工作进程的资源跟踪器是否由本进程自行启动（None 为尚未确定）
+_own_tracker = None
+
+
+def _tracker_is_own() -> bool:
+    """
+    工作进程是否使用自己的资源跟踪器
+    fork、spawn、forkserver 启动的子进程都继承主进程的跟踪器（首次映射前已持有其连接）；
+    只有未继承时映射块才会启动本进程自己的跟踪器
+    """
+    global _own_tracker
+    if _own_tracker is None:
+        _own_tracker = getattr(resource_tracker._resource_tracker, '_fd', None) is None
+    return _own_tracker
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """
+    在工作进程中按名称映射共享内存块
+    块的生命周期由创建方（SlabPool）管理：使用自己的资源跟踪器时取消登记，
+    否则工作进程退出时会删除仍在使用的块；与主进程共用跟踪器时重复登记不产生影响，
+    不能取消登记，否则主进程异常退出时块不会被清理
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    own = os.name == 'posix' and _tracker_is_own()
+    slab = shared_memory.SharedMemory(name=name)
+    if own:
+        resource_tracker.unregister(slab._name, 'shared_memory')
+    return slab
+
+
+class SlabPool:
+    """
+    共享内存块池（线程安全，仅在主进程中使用）
+    acquire 优先复用足够大的空闲块，块数达到上限时回收较小的空闲块重建，
+    全部占用时阻塞直到有块归还；close 时删除全部块
+    """
+
+    def __init__(self, max_slabs: int):
+        if os.name == 'posix':
+            # 先启动资源跟踪器：之后启动的工作进程与主进程共用同一个跟踪器
+            resource_tracker.ensure_running()
+        self.max_slabs = max(1, max_slabs)
+        self._slabs: Dict[str, shared_memory.SharedMemory] = {}
+        self._free: List[shared_memory.SharedMemory] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        # 统计：新建次数、复用次数、同时占用的峰值字节数
+        self.created = 0
+        self.reused = 0
+        self.peak_bytes = 0
+
+    def acquire(self, nbytes: int) -> shared_memory.SharedMemory:
+        """取得至少 nbytes 字节的块"""
+        nbytes = max(1, int(nbytes))
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("共享内存块池已关闭")
+                fits = [slab for slab in self._free if slab.size >= nbytes]
+                if fits:
+                    slab = min(fits, key=lambda s: s.size)
+                    self._free.remove(slab)
+                    self.reused += 1
+                    break
+                if len(self._slabs) >= self.max_slabs and self._free:
+                    # 空闲块都太小：回收最小的一块，为更大的块腾出名额
+                    self._discard(min(self._free, key=lambda s: s.size))
+                if len(self._slabs) < self.max_slabs:
+                    size = -(-nbytes // SLAB_ALIGN) * SLAB_ALIGN
+                    slab = shared_memory.SharedMemory(create=True, size=size)
+                    self._slabs[slab.name] = slab
+                    self.created += 1
+                    break
+                self._cond.wait()
+            self.peak_bytes = max(self.peak_bytes, self._in_use_bytes())
+            return slab
+
+    def release(self, slab: shared_memory.SharedMemory):
+        """归还块（调用方须先释放块上的数组视图）"""
+        with self._cond:
+            if slab.name in self._slabs:
+                self._free.append(slab)
+                self._cond.notify()
+
+    def _in_use_bytes(self) -> int:
+        free = {slab.name for slab in self._free}
+        return sum(slab.size for name, slab in self._slabs.items() if name not in free)
+
+    def _discard(self, slab: shared_memory.SharedMemory):
+        self._free.remove(slab)
+        del self._slabs[slab.name]
+        self._unlink(slab)
+
+    @staticmethod
+    def _unlink(slab: shared_memory.SharedMemory):
+        try:
+            slab.close()
+        except BufferError:
+            # 仍有数组视图引用该块：只删除名称，映射随视图回收
+            pass
+        slab.unlink()
+
+    def close(self):
+        """删除全部块；阻塞在 acquire 中的线程收到异常"""
+        with self._cond:
+            self._closed = True
+            for slab in self._slabs.values():
+                self._unlink(slab)
+            self._slabs.clear()
+            self._free.clear()
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
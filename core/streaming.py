@@ -0,0 +1,337 @@
+"""
+分条（strip）流式解密
+按固定高度的水平条带读取、变换并增量写出图像，
+峰值内存与条带大小相关，而与整幅图像大小无关。
+16位彩色PNG的条带与整幅解密一样读取完整的16位数据（见 deep_png）
+"""
+
+import io
+import struct
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .deep_png import (DEEP_COLOR_TYPES, decode_deep_color_png, deep_color_supported,
+                       read_deep_color_png)
+from .instrument import Sink, STAGE_ENCODE
+from .params import DecryptionParams
+from .png_chunks import PNG_SIGNATURE, read_chunk_header, make_chunk
+from .resident import ResidentSource
+
+# PNG颜色类型 -> 每像素通道数
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# 输出图像模式 -> PNG颜色类型
+_MODE_COLOR_TYPE = {'L': 0, 'RGB': 2, 'LA': 4, 'RGBA': 6}
+
+# 单次从文件读取的压缩数据块大小
+_READ_BLOCK = 1 << 20
+
+
+def _array_mode(array: np.ndarray) -> str:
+    """uint8数组对应的图像模式"""
+    if array.ndim == 2:
+        return 'L'
+    return {1: 'L', 2: 'LA', 3: 'RGB', 4: 'RGBA'}[array.shape[2]]
+
+
+class PngStripReader:
+    """
+    PNG分条读取器
+    只解压当前条带所需的IDAT数据，行反滤波交给PIL的C实现完成：
+    将上一条带最后一行（未滤波，滤波类型0）与本条带的已滤波行
+    拼成一个最小PNG，因此Up/Average/Paeth滤波都能正确还原。
+    产出 (条带图像, 完整的16位像素)；非16位彩色PNG时后者为None
+    """
+
+    def __init__(self, filepath: str, strip_height: int = 256):
+        self.filepath = filepath
+        self.strip_height = max(1, int(strip_height))
+        self._ancillary: List[bytes] = []   # 解码所需的附属块（PLTE、tRNS）
+
+        with open(filepath, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                raise ValueError("不是PNG文件")
+            while True:
+                length, chunk_type = read_chunk_header(f)
+                if chunk_type == b'IDAT':
+                    self._idat_offset = f.tell() - 8
+                    break
+                data = f.read(length)
+                f.read(4)  # CRC
+                if chunk_type == b'IHDR':
+                    (self.width, self.height, self.bit_depth, self.color_type,
+                     _, _, self.interlace) = struct.unpack('>IIBBBBB', data)
+                    self._ihdr_tail = data[8:]
+                elif chunk_type in (b'PLTE', b'tRNS'):
+                    self._ancillary.append(make_chunk(chunk_type, data))
+                elif chunk_type == b'IEND':
+                    raise ValueError("PNG文件缺少IDAT数据")
+
+        channels = _PNG_CHANNELS[self.color_type]
+        self.row_bytes = (self.width * channels * self.bit_depth + 7) // 8
+        # 16位彩色PNG：PIL 只能读出高8位，条带改由 OpenCV 解码
+        self.deep = (self.bit_depth == 16 and self.color_type in DEEP_COLOR_TYPES
+                     and deep_color_supported())
+
+    @property
+    def supported(self) -> bool:
+        """
+        是否支持真正的流式读取
+        需要非隔行扫描，并能从解码结果还原原始行字节
+        （8位任意颜色类型、16位灰度，或可完整读取的16位彩色）
+        """
+        if self.interlace:
+            return False
+        return self.bit_depth == 8 or (self.bit_depth == 16 and (self.color_type == 0 or self.deep))
+
+    def _idat_data(self) -> Iterator[bytes]:
+        """按块产出所有IDAT块中的压缩数据"""
+        with open(self.filepath, 'rb') as f:
+            f.seek(self._idat_offset)
+            while True:
+                length, chunk_type = read_chunk_header(f)
+                if chunk_type != b'IDAT':
+                    return
+                remaining = length
+                while remaining:
+                    block = f.read(min(remaining, _READ_BLOCK))
+                    if not block:
+                        raise ValueError("PNG文件不完整")
+                    remaining -= len(block)
+                    yield block
+                f.read(4)  # CRC
+
+    def _raw_row(self, strip: Image.Image, pixels: Optional[np.ndarray]) -> bytes:
+        """取条带最后一行的原始（未滤波）字节"""
+        last = (pixels if pixels is not None else np.asarray(strip))[-1]
+        if self.bit_depth == 16:
+            return last.astype('>u2').tobytes()
+        return last.tobytes()
+
+    def _decode_strip(self, filtered: bytes, rows: int, prev_row: Optional[bytes]
+                      ) -> Tuple[Image.Image, Optional[np.ndarray]]:
+        """把一个条带的已滤波数据包装成最小PNG并解码（16位彩色交给 OpenCV，其余交给PIL）"""
+        if prev_row is not None:
+            filtered = b'\x00' + prev_row + filtered
+            rows += 1
+        ihdr = struct.pack('>II', self.width, rows) + self._ihdr_tail
+        png = b''.join([PNG_SIGNATURE, make_chunk(b'IHDR', ihdr), *self._ancillary,
+                        make_chunk(b'IDAT', zlib.compress(filtered, 0)), make_chunk(b'IEND', b'')])
+        if self.deep:
+            pixels = decode_deep_color_png(png)
+            if pixels is None:
+                raise ValueError("16位彩色PNG条带解码失败")
+            if prev_row is not None:
+                pixels = pixels[1:]
+            # 条带图像与PIL读取的结果相同（各通道的高8位）
+            return Image.fromarray((pixels >> 8).astype(np.uint8)), pixels
+        strip = Image.open(io.BytesIO(png))
+        strip.load()
+        if prev_row is not None:
+            strip = strip.crop((0, 1, self.width, rows))
+        return strip, None
+
+    def __iter__(self) -> Iterator[Tuple[Image.Image, Optional[np.ndarray]]]:
+        if not self.supported:
+            raise ValueError("该PNG格式不支持流式读取")
+
+        decompressor = zlib.decompressobj()
+        compressed = self._idat_data()
+        buffer = bytearray()
+        prev_row = None
+        stride = self.row_bytes + 1
+
+        for top in range(0, self.height, self.strip_height):
+            rows = min(self.strip_height, self.height - top)
+            need = rows * stride
+            while len(buffer) < need:
+                data = decompressor.unconsumed_tail or next(compressed, b'')
+                if not data:
+                    raise ValueError("PNG图像数据不完整")
+                buffer += decompressor.decompress(data, need - len(buffer))
+
+            strip, pixels = self._decode_strip(bytes(buffer[:need]), rows, prev_row)
+            del buffer[:need]
+            prev_row = self._raw_row(strip, pixels)
+            yield strip, pixels
+
+
+def iter_strips(filepath: str, strip_height: int = 256
+                ) -> Iterator[Tuple[Image.Image, Optional[np.ndarray]]]:
+    """
+    按条带产出 (图像, 完整的16位像素或None)
+    支持的PNG真正流式读取；其他格式退回到PIL整体解码后按条裁剪
+    （16位彩色PNG同时整体读取16位数据）
+    """
+    try:
+        reader = PngStripReader(filepath, strip_height)
+    except (ValueError, KeyError, struct.error):
+        reader = None
+    if reader is not None and reader.supported:
+        yield from reader
+        return
+
+    with Image.open(filepath) as image:
+        image.load()
+        width, height = image.size
+        deep = read_deep_color_png(filepath) if reader is not None and reader.deep else None
+        for top in range(0, height, strip_height):
+            bottom = min(height, top + strip_height)
+            yield (image.crop((0, top, width, bottom)),
+                   deep[top:bottom] if deep is not None else None)
+
+
+class PngStripWriter:
+    """PNG增量编码器：逐条带压缩并写出IDAT块"""
+
+    def __init__(self, filepath: str, width: int, height: int, mode: str,
+                 compress_level: int = 6, text: Optional[Dict[str, str]] = None):
+        if mode not in _MODE_COLOR_TYPE:
+            raise ValueError(f"不支持的输出模式: {mode}")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(filepath, 'wb')
+
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, _MODE_COLOR_TYPE[mode], 0, 0, 0)
+        self._file.write(PNG_SIGNATURE + make_chunk(b'IHDR', ihdr))
+        for key, value in (text or {}).items():
+            self._file.write(make_chunk(b'tEXt', key.encode('latin-1') + b'\x00' + value.encode('latin-1')))
+
+    def write(self, strip: np.ndarray):
+        rows = strip.shape[0]
+        if self.rows_written + rows > self.height:
+            raise ValueError("写入的行数超过图像高度")
+        # 每行前加滤波类型0（None）
+        scanlines = np.empty((rows, strip[0].size + 1), dtype=np.uint8)
+        scanlines[:, 0] = 0
+        scanlines[:, 1:] = strip.reshape(rows, -1)
+        data = self._compressor.compress(scanlines.tobytes())
+        if data:
+            self._file.write(make_chunk(b'IDAT', data))
+        self.rows_written += rows
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"行数不完整: {self.rows_written}/{self.height}")
+            self._file.write(make_chunk(b'IDAT', self._compressor.flush()))
+            self._file.write(make_chunk(b'IEND', b''))
+        finally:
+            self._file.close()
+
+    def abort(self):
+        """放弃写出（异常时关闭文件）"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class RawStripWriter:
+    """原始数据增量写出：.npy 带数组头，其他扩展名为裸字节"""
+
+    def __init__(self, filepath: str, width: int, height: int, mode: str):
+        channels = Image.getmodebands(mode)
+        self.shape = (height, width) if channels == 1 else (height, width, channels)
+        self.rows_written = 0
+        self._file = open(filepath, 'wb')
+        if filepath.lower().endswith('.npy'):
+            np.lib.format.write_array_header_2_0(self._file, {
+                'descr': np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+                'fortran_order': False,
+                'shape': self.shape,
+            })
+
+    def write(self, strip: np.ndarray):
+        self._file.write(np.ascontiguousarray(strip, dtype=np.uint8).tobytes())
+        self.rows_written += strip.shape[0]
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            if self.rows_written != self.shape[0]:
+                raise ValueError(f"行数不完整: {self.rows_written}/{self.shape[0]}")
+
+    def abort(self):
+        """放弃写出（异常时关闭文件）"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_strip_writer(filepath: str, width: int, height: int, mode: str,
+                      compress_level: int = 6):
+    """根据扩展名选择增量编码器（.png 或 .npy/.raw）"""
+    if filepath.lower().endswith('.png'):
+        return PngStripWriter(filepath, width, height, mode, compress_level)
+    if filepath.lower().endswith(('.npy', '.raw')):
+        return RawStripWriter(filepath, width, height, mode)
+    raise ValueError(f"流式解密只支持 .png/.npy/.raw 输出: {filepath}")
+
+
+def decrypt_streaming(filepath: str, output_path: str, params: DecryptionParams,
+                      strip_height: int = 256, compress_level: int = 6,
+                      sink: Optional[Sink] = None) -> Tuple[int, int, str]:
+    """
+    分条解密并增量写出
+    所有模式都是逐像素变换，因此对每个条带调用同一个解密器即可得到
+    与整幅解密完全一致的结果
+    sink 接收各条带的解密阶段事件及写出（encode）事件
+    返回 (宽, 高, 输出模式)
+    """
+    from .decoder import ImageDecoder
+
+    with Image.open(filepath) as probe:
+        width, height = probe.size
+
+    decoder = ImageDecoder(sink=sink)
+    sink = decoder.sink
+    writer = None
+    try:
+        for strip, pixels in iter_strips(filepath, strip_height):
+            decoder.encrypted_image = strip
+            if pixels is not None:
+                decoder.resident_source = ResidentSource(strip, pixels)
+            result = decoder.decrypt(params, output='array')
+            if result is None:
+                raise ValueError(f"解密失败（模式: {params.mode}）")
+            if writer is None:
+                mode = _array_mode(result)
+                writer = open_strip_writer(output_path, width, height, mode, compress_level)
+            with sink.stage(STAGE_ENCODE, mode=params.mode) as span:
+                writer.write(result)
+                span.nbytes = result.nbytes
+        if writer is None:
+            raise ValueError("图像为空")
+        writer.close()
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+    finally:
+        decoder.encrypted_image = None
+        decoder.decrypted_image = None
+        decoder.resident_source = None
+
+    return width, height, mode
@@ -0,0 +1,29 @@
+"""
+汇总插桩事件文件
+用法: python -m core.trace_summary trace.jsonl [--by-mode]
+"""
+
+import argparse
+import sys
+
+from .instrument import StatsSink, read_jsonl
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m core.trace_summary',
+                                     description='汇总插桩事件文件（JSON-lines），输出各阶段 p50/p95')
+    parser.add_argument('trace', help='JsonLinesSink 写出的事件文件')
+    parser.add_argument('--by-mode', action='store_true', help='按解密模式分别统计')
+    args = parser.parse_args(argv)
+
+    try:
+        stats = StatsSink.from_events(read_jsonl(args.trace))
+    except OSError as e:
+        print(f"无法读取事件文件: {e}", file=sys.stderr)
+        return 2
+    print(stats.format_table(args.by_mode))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+参数对比窗口
+以网格显示同一代理图在不同参数下的解密缩略图，点击缩略图选用其参数
+"""
+
+import tkinter as tk
+from typing import Callable, List, Tuple
+
+from PIL import Image, ImageTk
+
+from core import DecryptionParams
+from core.compare import comparison_label
+from utils.constants import *
+
+# 每行缩略图数
+GRID_COLUMNS = 6
+
+
+class ComparisonWindow(tk.Toplevel):
+    """参数对比缩略图网格"""
+    
+    def __init__(self, parent, thumbnails: List[Tuple[DecryptionParams, Image.Image]],
+                 on_select: Callable[[DecryptionParams], None]):
+        super().__init__(parent, bg=BG_COLOR)
+        self.title("参数对比（点击缩略图使用该参数解密）")
+        self.on_select = on_select
+        # 保持PhotoImage引用，否则会被回收
+        self.photos = []
+        
+        for i, (params, thumb) in enumerate(thumbnails):
+            photo = ImageTk.PhotoImage(thumb)
+            self.photos.append(photo)
+            tk.Button(self, image=photo, text=comparison_label(params), compound=tk.TOP,
+                      command=lambda p=params: self._select(p),
+                      fg=FG_COLOR, bg=BG_DARK, activebackground=BG_COLOR,
+                      font=FONT_NORMAL).grid(row=i // GRID_COLUMNS, column=i % GRID_COLUMNS,
+                                             padx=3, pady=3)
+    
+    def _select(self, params: DecryptionParams):
+        self.on_select(params)
@@ -1,11 +1,27 @@
 """
 图像显示面板组件
+每幅图像构建一次图像金字塔，只渲染可见视口；
+缩放/拖动时先快速预览，停止操作后再高质量重绘
 """
 
 import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
 
+from .pyramid import ImagePyramid
+
+# 缩放范围
+MIN_SCALE = 0.01
+MAX_SCALE = 3.0
+
+# 交互中的预览合并间隔、停止操作后高质量重绘的延迟（毫秒）
+PREVIEW_DELAY_MS = 15
+SETTLE_DELAY_MS = 200
+
+PREVIEW_RESAMPLE = Image.Resampling.BILINEAR
+FINAL_RESAMPLE = Image.Resampling.LANCZOS
+
+
 class ImageDisplayPanel(tk.Frame):
     """图像显示面板"""
     
@@ -16,10 +32,16 @@ class ImageDisplayPanel(tk.Frame):
         self.original_image = None
         self.display_image = None
         self.photo_image = None
+        self.pyramid = None
         self.scale = 1.0
         self.canvas_width = 0
         self.canvas_height = 0
         
+        # 图像在画布坐标中的左上角（小于画布时居中）
+        self._offset = (0, 0)
+        self._preview_job = None
+        self._settle_job = None
+        
         self._setup_ui()
         
     def _setup_ui(self):
@@ -40,8 +62,8 @@ class ImageDisplayPanel(tk.Frame):
         self.canvas.pack(fill=tk.BOTH, expand=True)
         
         # 滚动条
-        v_scrollbar = ttk.Scrollbar(self.canvas_frame, orient=tk.VERTICAL, command=self.canvas.yview)
-        h_scrollbar = ttk.Scrollbar(self.canvas_frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        v_scrollbar = ttk.Scrollbar(self.canvas_frame, orient=tk.VERTICAL, command=self._on_yview)
+        h_scrollbar = ttk.Scrollbar(self.canvas_frame, orient=tk.HORIZONTAL, command=self._on_xview)
         
         self.canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
         
@@ -52,7 +74,7 @@ class ImageDisplayPanel(tk.Frame):
         tk.Label(control_frame, text="缩放:", fg='white', bg='#2b2b2b').pack(side=tk.LEFT, padx=5)
         
         self.scale_var = tk.DoubleVar(value=1.0)
-        self.scale_slider = ttk.Scale(control_frame, from_=0.1, to=3.0, 
+        self.scale_slider = ttk.Scale(control_frame, from_=MIN_SCALE, to=MAX_SCALE, 
                                       variable=self.scale_var, orient=tk.HORIZONTAL,
                                       command=self._on_scale_change)
         self.scale_slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
@@ -71,9 +93,9 @@ class ImageDisplayPanel(tk.Frame):
         self.canvas_width = event.width
         self.canvas_height = event.height
         if self.original_image:
-            self._fit_image_to_canvas()
+            self._fit_image_to_canvas(final=False)
     
-    def _fit_image_to_canvas(self):
+    def _fit_image_to_canvas(self, final=True):
         """让图像按最长边适应画布并居中"""
         if not self.original_image or self.canvas_width == 0 or self.canvas_height == 0:
             return
@@ -86,17 +108,42 @@ class ImageDisplayPanel(tk.Frame):
         scale_y = self.canvas_height / img_height
         
         # 选择能让最长边铺满的缩放比例
-        self.scale = min(scale_x, scale_y)
+        self._set_scale(min(scale_x, scale_y))
+        self._layout()
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        if final:
+            self._render(FINAL_RESAMPLE)
+        else:
+            self._schedule_render()
         
-        # 更新缩放滑块
+    def _set_scale(self, scale):
+        """更新缩放比例及滑块、百分比显示"""
+        self.scale = max(MIN_SCALE, min(MAX_SCALE, scale))
         self.scale_var.set(self.scale)
-        self._update_display(center=True)
+        self.scale_label.config(text=f"{int(self.scale * 100)}%")
+        
+    def _zoom(self, scale, anchor_x, anchor_y):
+        """缩放，并保持锚点（画布窗口坐标）下的图像位置不变"""
+        if self.original_image is None:
+            self._set_scale(scale)
+            return
+        
+        old_scale = self.scale
+        old_x, old_y = self._offset
+        image_x = (self.canvas.canvasx(anchor_x) - old_x) / old_scale
+        image_y = (self.canvas.canvasy(anchor_y) - old_y) / old_scale
+        
+        self._set_scale(scale)
+        width, height = self._layout()
+        new_x, new_y = self._offset
+        self.canvas.xview_moveto((image_x * self.scale + new_x - anchor_x) / width)
+        self.canvas.yview_moveto((image_y * self.scale + new_y - anchor_y) / height)
+        self._schedule_render()
         
     def _on_scale_change(self, event=None):
-        """缩放变化处理"""
-        self.scale = self.scale_var.get()
-        self.scale_label.config(text=f"{int(self.scale * 100)}%")
-        self._update_display()
+        """缩放变化处理（以视口中心为锚点）"""
+        self._zoom(self.scale_var.get(), self.canvas_width / 2, self.canvas_height / 2)
         
     def _on_mouse_press(self, event):
         """鼠标按下"""
@@ -105,53 +152,112 @@ class ImageDisplayPanel(tk.Frame):
     def _on_mouse_drag(self, event):
         """鼠标拖动"""
         self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self._schedule_render()
         
     def _on_mouse_wheel(self, event):
-        """鼠标滚轮缩放"""
-        if event.delta > 0:
-            self.scale *= 1.1
-        else:
-            self.scale /= 1.1
-            
-        self.scale = max(0.1, min(3.0, self.scale))
-        self.scale_var.set(self.scale)
-        self._update_display()
+        """鼠标滚轮缩放（以鼠标位置为锚点）"""
+        factor = 1.1 if event.delta > 0 else 1 / 1.1
+        self._zoom(self.scale * factor, event.x, event.y)
+        
+    def _on_xview(self, *args):
+        self.canvas.xview(*args)
+        self._schedule_render()
+        
+    def _on_yview(self, *args):
+        self.canvas.yview(*args)
+        self._schedule_render()
         
     def set_image(self, image: Image.Image):
         """设置显示图像"""
         self.original_image = image
+        self.pyramid = ImagePyramid(image)
         # 等待Canvas更新后再适应
         self.canvas.after(100, self._fit_image_to_canvas)
+
+    def replace_image(self, image: Image.Image):
+        """立即替换显示图像；尺寸不变时保持当前缩放和位置（用于实时预览）"""
+        same_size = self.original_image is not None and self.original_image.size == image.size
+        self.original_image = image
+        self.pyramid = ImagePyramid(image)
+        if not same_size:
+            self._fit_image_to_canvas()
+        elif self.canvas_width > 0 and self.canvas_height > 0:
+            self._layout()
+            self._render(FINAL_RESAMPLE)
+
+    def _layout(self):
+        """按当前缩放计算图像位置和滚动区域，返回滚动区域大小"""
+        width = self.original_image.width * self.scale
+        height = self.original_image.height * self.scale
         
-    def _update_display(self, center=False):
-        """更新显示"""
-        if self.original_image is None:
+        # 小于画布时居中显示
+        x = max(0, (self.canvas_width - width) // 2)
+        y = max(0, (self.canvas_height - height) // 2)
+        self._offset = (x, y)
+        
+        region_width = max(width, self.canvas_width, 1)
+        region_height = max(height, self.canvas_height, 1)
+        self.canvas.config(scrollregion=(0, 0, region_width, region_height))
+        return region_width, region_height
+        
+    def _schedule_render(self):
+        """合并连续的交互事件：先快速预览，停止操作后再高质量重绘"""
+        if self._preview_job is None:
+            self._preview_job = self.canvas.after(PREVIEW_DELAY_MS, self._on_preview)
+        if self._settle_job is not None:
+            self.canvas.after_cancel(self._settle_job)
+        self._settle_job = self.canvas.after(SETTLE_DELAY_MS, self._on_settle)
+        
+    def _on_preview(self):
+        self._preview_job = None
+        self._render(PREVIEW_RESAMPLE)
+        
+    def _on_settle(self):
+        self._settle_job = None
+        self._render(FINAL_RESAMPLE)
+        
+    def _cancel_render(self):
+        for job in (self._preview_job, self._settle_job):
+            if job is not None:
+                self.canvas.after_cancel(job)
+        self._preview_job = self._settle_job = None
+        
+    def _render(self, resample=FINAL_RESAMPLE):
+        """从金字塔中渲染当前可见视口"""
+        if self.pyramid is None:
             return
-            
-        # 计算显示尺寸
-        width = int(self.original_image.width * self.scale)
-        height = int(self.original_image.height * self.scale)
         
-        # 调整图像大小
-        self.display_image = self.original_image.resize((width, height), Image.Resampling.LANCZOS)
-        self.photo_image = ImageTk.PhotoImage(self.display_image)
+        # 可见区域（画布坐标）-> 显示坐标
+        view_x = int(self.canvas.canvasx(0))
+        view_y = int(self.canvas.canvasy(0))
+        offset_x, offset_y = self._offset
+        viewport = (view_x - offset_x, view_y - offset_y, self.canvas_width, self.canvas_height)
         
-        # 更新画布
+        self.display_image = self.pyramid.render(self.scale, viewport, resample)
         self.canvas.delete("all")
+        if self.display_image is None:
+            self.photo_image = None
+            return
         
-        if center and self.canvas_width > 0 and self.canvas_height > 0:
-            # 居中显示
-            x = max(0, (self.canvas_width - width) // 2)
-            y = max(0, (self.canvas_height - height) // 2)
-            self.canvas.create_image(x, y, anchor=tk.NW, image=self.photo_image)
-        else:
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo_image)
-            
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        self.photo_image = ImageTk.PhotoImage(self.display_image)
+        self.canvas.create_image(max(view_x, offset_x), max(view_y, offset_y),
+                                 anchor=tk.NW, image=self.photo_image)
+        
+    def _update_display(self, center=False):
+        """更新显示"""
+        if self.original_image is None:
+            return
+        self._layout()
+        if center:
+            self.canvas.xview_moveto(0)
+            self.canvas.yview_moveto(0)
+        self._render(FINAL_RESAMPLE)
         
     def clear(self):
         """清空显示"""
+        self._cancel_render()
         self.original_image = None
         self.display_image = None
         self.photo_image = None
-        self.canvas.delete("all")
\ No newline at end of file
+        self.pyramid = None
+        self.canvas.delete("all")
@@ -2,11 +2,18 @@
 主窗口类
 """
 
+import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import time
 import traceback
-from core import ImageDecoder, DecryptionParams
+from core import ImageDecoder, DecryptionParams, ResultCache
+from core.compare import render_comparison, THUMB_SIZE
+from core.lut import DecodeCancelled, check_cancelled
+from core.saving import AsyncSaver, SaveOptions
+from .compare_panel import ComparisonWindow
 from .image_panel import ImageDisplayPanel
+from .worker import BackgroundWorker, Job
 from utils.constants import *
 
 class MainWindow:
@@ -21,14 +28,32 @@ class MainWindow:
         self.style = ttk.Style()
         self.style.theme_use('clam')
         
-        # 解密器
-        self.decoder = ImageDecoder()
+        # 解密器（重复解密同一图像和参数时直接命中缓存）；每次加载新建解密器，
+        # 加载完成后在主线程中替换，后台加载期间主线程读取的仍是原解密器
+        self.result_cache = ResultCache(RESULT_CACHE_BYTES)
+        self.decoder = ImageDecoder(result_cache=self.result_cache)
+        self._load_job = None
         
         # 当前模式
         self.current_mode = tk.StringVar(value="auto")
         
-        # 参数变量
+        # 参数变量；LSB位数滑块及其变量（上限随图像位深调整）
         self.params_vars = {}
+        self._bits_scales = []
+        
+        # 手动模式实时预览：在显示尺寸的代理图上解密，全分辨率解密只在确认或保存时进行
+        self.live_preview = tk.BooleanVar(value=True)
+        self.preview_decoder = None
+        self._preview_job = None
+        self._decoded_params = None   # 当前全分辨率结果对应的参数
+        self.compare_window = None
+        
+        # 加载/解密/保存在后台线程执行，结果经 after() 轮询回到界面
+        self.worker = BackgroundWorker(self.root, on_state=self._on_worker_state)
+        # 保存在独立的写出线程中进行，不阻塞后续的加载和解密
+        self.saver = AsyncSaver()
+        self.png_level = tk.StringVar(value=str(DEFAULT_PNG_LEVEL))
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         
         self._setup_ui()
         self._apply_dark_theme()
@@ -66,6 +91,14 @@ class MainWindow:
                  bg=BTN_SUCCESS, fg=FG_COLOR,
                  font=FONT_NORMAL, width=20).pack(pady=5)
         
+        level_frame = tk.Frame(file_frame, bg=BG_COLOR)
+        level_frame.pack(pady=(0, 5))
+        tk.Label(level_frame, text="PNG压缩级别（0-9，越小越快）:",
+                fg=FG_COLOR, bg=BG_COLOR).pack(side=tk.LEFT)
+        ttk.Combobox(level_frame, textvariable=self.png_level,
+                     values=[str(level) for level in range(10)],
+                     state='readonly', width=3).pack(side=tk.LEFT, padx=5)
+        
         # 模式选择区
         mode_frame = tk.LabelFrame(left_panel, text="解密模式", 
                                   fg=FG_COLOR, bg=BG_COLOR,
@@ -114,6 +147,10 @@ class MainWindow:
         self.dynamic_params_frame = tk.Frame(self.manual_params_frame, bg=BG_COLOR)
         self.dynamic_params_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
         
+        tk.Checkbutton(self.manual_params_frame, text="实时预览",
+                      variable=self.live_preview, command=self._on_param_change,
+                      fg=FG_COLOR, bg=BG_COLOR, selectcolor=BG_COLOR).grid(row=2, column=0, sticky=tk.W, padx=10)
+        
         # 解密按钮
         tk.Button(left_panel, text="开始解密", 
                  command=self._decrypt_image,
@@ -121,6 +158,28 @@ class MainWindow:
                  font=FONT_LARGE_BOLD, 
                  height=2).pack(fill=tk.X, padx=5, pady=10)
         
+        tk.Button(left_panel, text="参数对比",
+                 command=self._compare_params,
+                 bg=BTN_PRIMARY, fg=FG_COLOR,
+                 font=FONT_NORMAL).pack(fill=tk.X, padx=5, pady=(0, 10))
+        
+        # 后台任务进度
+        status_frame = tk.Frame(left_panel, bg=BG_COLOR)
+        status_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=200)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        
+        self.cancel_button = tk.Button(status_frame, text="取消",
+                                       command=self._cancel_tasks,
+                                       bg=BG_DARK, fg=FG_COLOR,
+                                       font=FONT_NORMAL, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
+        self.status_label = tk.Label(left_panel, text="就绪", anchor=tk.W,
+                                     fg=FG_COLOR, bg=BG_COLOR, font=FONT_NORMAL)
+        self.status_label.pack(fill=tk.X, padx=10)
+        
         # === 右侧显示区域 ===
         
         # 加密图像显示
@@ -154,6 +213,8 @@ class MainWindow:
         # 清空动态参数区
         for widget in self.dynamic_params_frame.winfo_children():
             widget.destroy()
+        self.params_vars = {}
+        self._bits_scales = []
             
         encrypt_type = self.encrypt_type.get()
         
@@ -167,7 +228,52 @@ class MainWindow:
             self._create_smart_lsb_params()
         elif encrypt_type == '自适应':
             self._create_adaptive_params()
+        
+        # 任一参数变化都触发预览
+        for var in self.params_vars.values():
+            var.trace_add('write', self._on_param_change)
+        self._on_param_change()
             
+    def _on_param_change(self, *args):
+        """参数变化：合并连续变化后刷新预览"""
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._preview_job = None
+        if (self.live_preview.get() and self.preview_decoder is not None
+                and self.current_mode.get() == "manual"):
+            self._preview_job = self.root.after(PREVIEW_DEBOUNCE_MS, self._render_preview)
+    
+    def _render_preview(self):
+        """主线程：在代理图上解密当前手动参数（代理解密器独立于后台任务使用的解密器）"""
+        self._preview_job = None
+        try:
+            params = self._get_manual_params()
+        except (tk.TclError, ValueError):
+            # 滑块拖动中的中间值
+            return
+        started = time.perf_counter()
+        result = self.preview_decoder.decrypt(params)
+        if result is None:
+            return
+        self.decrypted_display.replace_image(result)
+        if self.worker.current is None:
+            width, height = result.size
+            self.status_label.config(
+                text=f"预览 {width}x{height}：{(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    def _preview_size(self):
+        """代理图尺寸：解密结果面板的画布大小"""
+        canvas = self.decrypted_display.canvas
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return PREVIEW_MAX_SIZE
+        return width, height
+    
+    def _bind_label(self, name: str, label: tk.Label, fmt):
+        """数值标签随参数变量更新（拖动滑块和程序设置参数时均生效）"""
+        var = self.params_vars[name]
+        var.trace_add('write', lambda *args: label.config(text=fmt(float(var.get()))))
+    
     def _create_default_params(self):
         """创建默认模式参数"""
         # 模式类型
@@ -196,7 +302,7 @@ class MainWindow:
                                  fg=FG_COLOR, bg=BG_COLOR)
         boundary_label.grid(row=1, column=3, pady=5)
         
-        boundary_scale.config(command=lambda v: boundary_label.config(text=str(int(float(v)))))
+        self._bind_label('boundary', boundary_label, lambda v: str(int(v)))
         
         # 亮度参数
         tk.Label(self.dynamic_params_frame, text="亮度(l):", 
@@ -212,7 +318,7 @@ class MainWindow:
                                    fg=FG_COLOR, bg=BG_COLOR)
         brightness_label.grid(row=2, column=3, pady=5)
         
-        brightness_scale.config(command=lambda v: brightness_label.config(text=str(int(float(v)))))
+        self._bind_label('brightness', brightness_label, lambda v: str(int(v)))
         
         # 分辨率
         tk.Label(self.dynamic_params_frame, text="分辨率:", 
@@ -241,22 +347,24 @@ class MainWindow:
                 fg=FG_COLOR, bg=BG_COLOR).grid(row=0, column=0, sticky=tk.W, pady=5)
         
         self.params_vars['bits'] = tk.IntVar(value=DEFAULT_LSB_BITS)
-        bits_scale = ttk.Scale(self.dynamic_params_frame, from_=1, to=8,
+        # 8位图像最多8位，16位图像最多16位（见 _update_bits_range）
+        bits_scale = ttk.Scale(self.dynamic_params_frame, from_=1, to=self.decoder.max_lsb_bits,
                               variable=self.params_vars['bits'],
                               orient=tk.HORIZONTAL, length=150)
         bits_scale.grid(row=0, column=1, pady=5)
+        self._bits_scales.append((bits_scale, self.params_vars['bits']))
         
         bits_label = tk.Label(self.dynamic_params_frame, text=f"{DEFAULT_LSB_BITS} bits", 
                              fg=FG_COLOR, bg=BG_COLOR)
         bits_label.grid(row=0, column=2, pady=5)
         
-        bits_scale.config(command=lambda v: bits_label.config(text=f"{int(float(v))} bits"))
+        self._bind_label('bits', bits_label, lambda v: f"{int(v)} bits")
         
     def _create_channel_lsb_params(self):
         """创建通道LSB参数"""
         channels = ['R', 'G', 'B']
         default_bits = DEFAULT_CHANNEL_BITS
-        max_bits = [8, 8, 8]  # 支持1-8位
+        max_bits = [self.decoder.max_lsb_bits] * 3  # 支持1-8位（16位图像1-16位）
         
         for i, (channel, default, max_bit) in enumerate(zip(channels, default_bits, max_bits)):
             tk.Label(self.dynamic_params_frame, text=f"{channel}通道:", 
@@ -267,12 +375,13 @@ class MainWindow:
                             variable=self.params_vars[f'{channel}_bits'],
                             orient=tk.HORIZONTAL, length=150)
             scale.grid(row=i, column=1, pady=5)
+            self._bits_scales.append((scale, self.params_vars[f'{channel}_bits']))
             
             label = tk.Label(self.dynamic_params_frame, text=f"{default} bits", 
                            fg=FG_COLOR, bg=BG_COLOR)
             label.grid(row=i, column=2, pady=5)
             
-            scale.config(command=lambda v, l=label: l.config(text=f"{int(float(v))} bits"))
+            self._bind_label(f'{channel}_bits', label, lambda v: f"{int(v)} bits")
             
     def _create_smart_lsb_params(self):
         """创建智能LSB参数"""
@@ -290,7 +399,7 @@ class MainWindow:
                            fg=FG_COLOR, bg=BG_COLOR)
         min_label.grid(row=0, column=2, pady=5)
         
-        min_scale.config(command=lambda v: min_label.config(text=f"{int(float(v))} bit{'s' if int(float(v))>1 else ''}"))
+        self._bind_label('min_bits', min_label, lambda v: f"{int(v)} bit{'s' if int(v)>1 else ''}")
         
         # 最大位数
         tk.Label(self.dynamic_params_frame, text="最大位数:", 
@@ -306,7 +415,7 @@ class MainWindow:
                            fg=FG_COLOR, bg=BG_COLOR)
         max_label.grid(row=1, column=2, pady=5)
         
-        max_scale.config(command=lambda v: max_label.config(text=f"{int(float(v))} bits"))
+        self._bind_label('max_bits', max_label, lambda v: f"{int(v)} bits")
         
         # 阈值
         tk.Label(self.dynamic_params_frame, text="阈值:", 
@@ -322,7 +431,7 @@ class MainWindow:
                                  fg=FG_COLOR, bg=BG_COLOR)
         threshold_label.grid(row=2, column=2, pady=5)
         
-        threshold_scale.config(command=lambda v: threshold_label.config(text=f"{float(v):.2f}"))
+        self._bind_label('threshold', threshold_label, lambda v: f"{v:.2f}")
         
     def _create_adaptive_params(self):
         """创建自适应参数"""
@@ -346,7 +455,7 @@ class MainWindow:
                                  fg=FG_COLOR, bg=BG_COLOR)
         threshold_label.grid(row=1, column=2, pady=5)
         
-        threshold_scale.config(command=lambda v: threshold_label.config(text=f"{float(v):.2f}"))
+        self._bind_label('threshold', threshold_label, lambda v: f"{v:.2f}")
         
     def _import_image(self):
         """导入加密图像"""
@@ -356,17 +465,73 @@ class MainWindow:
         )
         
         if filepath:
-            if self.decoder.load_image(filepath):
-                self.encrypted_display.set_image(self.decoder.encrypted_image)
-                
-                # 自动模式下显示元数据
-                if self.current_mode.get() == "auto":
-                    self._display_metadata()
-                    
-                messagebox.showinfo("成功", "图像加载成功！")
-            else:
-                messagebox.showerror("错误", "无法加载图像！")
+            # 新图像使正在进行的解密和旧的预览失效
+            self.preview_decoder = None
+            self._decoded_params = None
+            self._load_job = self.worker.submit(
+                'load', self._load_file, filepath, self._preview_size(),
+                description=f"正在加载 {os.path.basename(filepath)}",
+                on_done=self._on_image_loaded,
+                on_error=lambda e: self._on_task_error("加载", e),
+                supersedes=('decode', 'compare'))
+    
+    def _load_file(self, filepath: str, preview_size):
+        """
+        后台线程：在新的解密器中加载图像、建立常驻源数据并生成预览代理
+        返回 (解密器, 预览代理)，失败返回None
+        """
+        decoder = ImageDecoder(result_cache=self.result_cache)
+        # 交互式调参会反复解密同一图像，加载时即建立常驻的只读源数据
+        if not decoder.load_image(filepath, resident='eager'):
+            return None
+        check_cancelled()
+        proxy = decoder.make_proxy(preview_size)
+        return (decoder, proxy) if proxy is not None else None
+    
+    def _task_decoder(self):
+        """主线程：后台任务使用的解密器（正在加载图像时为加载任务，由后台线程取其结果）"""
+        if self._load_job is not None and self.worker.has('load'):
+            return self._load_job
+        return self.decoder
+    
+    @staticmethod
+    def _resolve_decoder(target) -> ImageDecoder:
+        """
+        后台线程：取得 _task_decoder 返回的解密器
+        后台任务顺序执行，此时加载任务已经结束；加载失败或被取消时本任务同样取消
+        """
+        if isinstance(target, Job):
+            future = target.future
+            loaded = future.result() if future.done() and not future.cancelled() else None
+            if loaded is None or target.cancelled:
+                raise DecodeCancelled()
+            return loaded[0]
+        return target
+    
+    def _on_image_loaded(self, loaded):
+        """主线程：换用新加载的解密器并显示"""
+        if loaded is None:
+            messagebox.showerror("错误", "无法加载图像！")
+            return
+        self.decoder, self.preview_decoder = loaded
+        self.encrypted_display.set_image(self.decoder.encrypted_image)
+        self._update_bits_range()
+        self._on_param_change()
+        
+        # 自动模式下显示元数据
+        if self.current_mode.get() == "auto":
+            self._display_metadata()
+            
+        messagebox.showinfo("成功", "图像加载成功！")
                 
+    def _update_bits_range(self):
+        """按当前图像调整LSB位数滑块的上限（8位图像超过8位与8位结果相同，不提供）"""
+        limit = self.decoder.max_lsb_bits
+        for scale, var in self._bits_scales:
+            scale.config(to=limit)
+            if var.get() > limit:
+                var.set(limit)
+    
     def _display_metadata(self):
         """显示元数据信息 - 优化自适应模式显示 v3.0"""
         self.info_text.delete(1.0, tk.END)
@@ -487,40 +652,141 @@ class MainWindow:
                 self.info_text.insert(tk.END, f"\n软件信息:\n")
                 self.info_text.insert(tk.END, f"{self.decoder.metadata['software']}\n")
                 
-    def _decrypt_image(self):
-        """执行解密 - 优化错误处理"""
-        if self.decoder.encrypted_image is None:
+    def _decrypt_image(self, search: bool = False):
+        """执行解密 - 在后台线程中进行，新的请求会取代尚未完成的旧请求"""
+        if self.decoder.encrypted_image is None and not self.worker.has('load'):
             messagebox.showwarning("警告", "请先导入加密图像！")
             return
             
-        try:
-            if self.current_mode.get() == "auto":
-                # 自动模式
-                params = self.decoder.auto_detect_params()
-                if params is None:
-                    messagebox.showwarning("警告", "无法从元数据获取解密参数，请使用手动模式！")
-                    return
-                    
-                print(f"使用自动检测参数: {params}")
-            else:
-                # 手动模式
-                params = self._get_manual_params()
-                print(f"使用手动参数: {params}")
-                
-            # 执行解密
-            result = self.decoder.decrypt(params)
+        # 自动模式的参数在后台读取（此时可能仍在加载图像）
+        params = None if self.current_mode.get() == "auto" else self._get_manual_params()
+        self.worker.submit('decode', self._decode, self._task_decoder(), params, search,
+                           description="正在搜索参数并解密" if search else "正在解密",
+                           on_done=self._on_decrypted,
+                           on_error=lambda e: self._on_task_error("解密", e))
+    
+    def _decode(self, target, params, search: bool):
+        """
+        后台线程：用 target（见 _task_decoder）解密
+        自动模式下 params 为None，从元数据获取；search 为True时缺失元数据则暴力搜索
+        返回 (参数, 搜索候选, 解密结果)
+        """
+        decoder = self._resolve_decoder(target)
+        candidates = None
+        if params is None:
+            params = decoder.auto_detect_params()
+            if params is None:
+                if not search:
+                    return None, None, None
+                candidates = decoder.search_params(top_k=5)
+                if not candidates:
+                    return None, candidates, None
+                params = candidates[0]
+            print(f"使用自动检测参数: {params}")
+        else:
+            print(f"使用手动参数: {params}")
+        check_cancelled()
+        return params, candidates, decoder.decrypt(params, workers=None)
+    
+    def _on_decrypted(self, outcome):
+        """主线程：显示解密结果"""
+        params, candidates, result = outcome
+        if candidates is not None:
+            self._show_search_results(candidates)
+        if params is None:
+            if candidates is not None:
+                messagebox.showwarning("警告", "未找到可用参数，请使用手动模式！")
+            elif messagebox.askyesno("提示", "无法从元数据获取解密参数，是否自动搜索参数？\n"
+                                            "（选择“否”可切换到手动模式）"):
+                self._decrypt_image(search=True)
+            return
+        
+        if result:
+            self._decoded_params = params
+            self.decrypted_display.set_image(result)
+            messagebox.showinfo("成功", "解密完成！")
+        else:
+            messagebox.showerror("错误", "解密失败！请检查参数是否正确。")
+    
+    def _on_task_error(self, action: str, error: Exception):
+        """主线程：后台任务异常"""
+        print(f"{action}异常: {error}")
+        traceback.print_exception(type(error), error, error.__traceback__)
+        messagebox.showerror("错误", f"{action}过程出错：{str(error)}")
+    
+    def _on_worker_state(self, job):
+        """主线程：更新进度条、状态文字和取消按钮"""
+        if job is None:
+            self.progress.stop()
+            self.status_label.config(text="就绪")
+            self.cancel_button.config(state=tk.DISABLED)
+            return
+        if self.cancel_button['state'] == tk.DISABLED:
+            self.progress.start(15)
+        self.status_label.config(text=f"{job.description}… {job.elapsed:.1f}s")
+        self.cancel_button.config(state=tk.NORMAL)
+    
+    def _cancel_tasks(self):
+        """取消加载、解密（包括保存前的解密）和参数对比（正在执行的解密在分带之间结束，结果被丢弃）"""
+        self.worker.cancel(('load', 'decode', 'save-decode', 'compare'))
             
-            if result:
-                self.decrypted_display.set_image(result)
-                messagebox.showinfo("成功", "解密完成！")
-            else:
-                messagebox.showerror("错误", "解密失败！请检查参数是否正确。")
-                
-        except Exception as e:
-            print(f"解密异常: {e}")
-            traceback.print_exc()
-            messagebox.showerror("错误", f"解密过程出错：{str(e)}")
+    def _compare_params(self):
+        """在同一代理图上并行解密常用参数，以缩略图网格对比"""
+        if self.decoder.encrypted_image is None and not self.worker.has('load'):
+            messagebox.showwarning("警告", "请先导入加密图像！")
+            return
+        self.worker.submit('compare', self._render_comparison, self._task_decoder(),
+                           description="正在生成参数对比",
+                           on_done=self._show_comparison,
+                           on_error=lambda e: self._on_task_error("参数对比", e))
+    
+    def _render_comparison(self, target):
+        """后台线程：生成对比缩略图"""
+        proxy = self._resolve_decoder(target).make_proxy(THUMB_SIZE)
+        return render_comparison(proxy) if proxy is not None else []
+    
+    def _show_comparison(self, thumbnails):
+        """主线程：打开对比窗口（替换已打开的窗口）"""
+        if self.compare_window is not None and self.compare_window.winfo_exists():
+            self.compare_window.destroy()
+        self.compare_window = ComparisonWindow(self.root, thumbnails, self._use_params)
+    
+    def _use_params(self, params: DecryptionParams):
+        """选用对比窗口中的参数：填入手动模式参数并全分辨率解密"""
+        self.current_mode.set("manual")
+        if params.mode == 'simple_lsb':
+            self.encrypt_type.set('简单LSB')
+            self._on_mode_change()
+            self.params_vars['bits'].set(params.bits)
+        elif params.mode == 'channel_lsb':
+            self.encrypt_type.set('通道LSB')
+            self._on_mode_change()
+            for channel in ('R', 'G', 'B'):
+                self.params_vars[f'{channel}_bits'].set(params.channel_bits[channel])
+        elif params.mode == 'default':
+            self.encrypt_type.set('默认模式')
+            self._on_mode_change()
+            self.params_vars['mode_type'].set(params.mode_type)
+            self.params_vars['boundary'].set(params.boundary)
+        self._decrypt_image()
             
+    def _show_search_results(self, candidates):
+        """在信息栏列出搜索候选"""
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, "未检测到元数据，自动搜索结果：\n")
+        self.info_text.insert(tk.END, "=" * 35 + "\n\n")
+        for i, params in enumerate(candidates, 1):
+            if params.mode == 'simple_lsb':
+                detail = f"{params.bits} bits"
+            elif params.mode == 'channel_lsb':
+                bits = params.channel_bits
+                detail = f"R={bits['R']} G={bits['G']} B={bits['B']}"
+            elif params.mode == 'smart_lsb':
+                detail = f"{params.bit_range['min']}-{params.bit_range['max']} bits, 阈值 {params.threshold}"
+            else:
+                detail = f"{params.mode_type}, 分界点 {params.boundary}"
+            self.info_text.insert(tk.END, f"{i}. {params.mode}: {detail}\n")
+
     def _get_manual_params(self) -> DecryptionParams:
         """获取手动模式参数"""
         encrypt_type = self.encrypt_type.get()
@@ -563,21 +829,64 @@ class MainWindow:
                 threshold=self.params_vars['threshold'].get()
             )
             
+    def _pending_params(self):
+        """手动模式下尚未全分辨率解密的当前参数（与已有结果一致时为None）"""
+        if self.current_mode.get() != "manual" or self.decoder.encrypted_image is None:
+            return None
+        params = self._get_manual_params()
+        return None if params == self._decoded_params else params
+    
     def _save_result(self):
-        """保存解密结果"""
-        if self.decoder.decrypted_image is None:
+        """保存解密结果（预览参数尚未全分辨率解密时，先解密再保存）"""
+        pending = self._pending_params()
+        if self.decoder.decrypted_image is None and pending is None:
             messagebox.showwarning("警告", "没有可保存的解密结果！")
             return
             
         filepath = filedialog.asksaveasfilename(
             title="保存解密图像",
             defaultextension=".png",
-            filetypes=[("PNG文件", "*.png"), ("JPEG文件", "*.jpg"), ("所有文件", "*.*")]
+            filetypes=[("PNG文件", "*.png"), ("无压缩TIFF", "*.tif"), ("无损WebP", "*.webp"),
+                       ("NumPy数组", "*.npy"), ("JPEG文件", "*.jpg"), ("所有文件", "*.*")]
         )
         
-        if filepath:
-            self.decoder.decrypted_image.save(filepath)
-            messagebox.showinfo("成功", f"图像已保存到：{filepath}")
+        if filepath and pending is not None:
+            # 单独的任务类别：之后的解密请求不会取代它，已选择的保存不会被静默丢弃
+            self.worker.submit('save-decode', self._decode, self._task_decoder(), pending, False,
+                               description=f"正在解密（保存到 {os.path.basename(filepath)}）",
+                               on_done=lambda outcome: self._on_decoded_for_save(outcome, filepath),
+                               on_error=lambda e: self._on_task_error("解密", e),
+                               supersedes=None)
+        elif filepath:
+            # 保存当前结果的引用，之后的解密不影响本次保存
+            self._queue_save(self.decoder.decrypted_image, filepath)
+    
+    def _save_options(self) -> SaveOptions:
+        """当前保存设置"""
+        return SaveOptions(compress_level=int(self.png_level.get()))
+    
+    def _queue_save(self, image, filepath: str):
+        """交给后台写出线程保存，完成后在主线程提示"""
+        future = self.saver.submit(image, filepath, self._save_options())
+        self.worker.watch('save', future, description=f"正在保存 {os.path.basename(filepath)}",
+                          on_done=lambda _: messagebox.showinfo("成功", f"图像已保存到：{filepath}"),
+                          on_error=lambda e: self._on_task_error("保存", e))
+    
+    def _on_decoded_for_save(self, outcome, filepath: str):
+        """主线程：显示全分辨率结果并保存"""
+        params, _, result = outcome
+        if result is None:
+            messagebox.showerror("错误", "解密失败！请检查参数是否正确。")
+            return
+        self._decoded_params = params
+        self.decrypted_display.set_image(result)
+        self._queue_save(result, filepath)
+    
+    def _on_close(self):
+        """关闭窗口时丢弃未完成的后台任务（已排队的保存会先写完）"""
+        self.worker.shutdown()
+        self.saver.close()
+        self.root.destroy()
             
     def run(self):
         """运行程序"""
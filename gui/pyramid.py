@@ -0,0 +1,81 @@
+"""
+显示用图像金字塔
+每幅图像只构建一次多分辨率层级（逐级2倍缩小，按需生成），
+显示时从最接近的层级中只渲染可见视口，缩放成本与视口大小相关
+"""
+
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+# PhotoImage 可直接显示的模式
+DISPLAY_MODES = ('L', 'RGB', 'RGBA')
+
+# 最小层级的最长边
+MIN_LEVEL_SIZE = 256
+
+
+def _display_ready(image: Image.Image) -> Image.Image:
+    """转换为可缩放、可显示的模式（调色板/16位等转为RGB或RGBA）"""
+    if image.mode in DISPLAY_MODES:
+        return image
+    if image.mode in ('LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+class ImagePyramid:
+    """图像金字塔：level 0 为原图，level k 为原图缩小 2**k 倍"""
+
+    def __init__(self, image: Image.Image, min_size: int = MIN_LEVEL_SIZE):
+        self.width, self.height = image.size
+        self.min_size = min_size
+        self._levels: List[Image.Image] = [_display_ready(image)]
+
+    @property
+    def max_level(self) -> int:
+        """最小层级的编号（最长边不小于 min_size）"""
+        level, size = 0, max(self.width, self.height)
+        while size // 2 >= self.min_size:
+            size //= 2
+            level += 1
+        return level
+
+    def level(self, k: int) -> Image.Image:
+        """第k层图像（首次访问时由上一层缩小得到）"""
+        k = max(0, min(k, self.max_level))
+        while len(self._levels) <= k:
+            previous = self._levels[-1]
+            # reduce 为2x2均值，比通用缩放快得多
+            self._levels.append(previous.reduce(2))
+        return self._levels[k]
+
+    def level_for(self, scale: float) -> int:
+        """显示比例 scale 下可用的最小层级（分辨率不低于显示所需）"""
+        k = 0
+        while k < self.max_level and scale * (2 ** (k + 1)) <= 1.0:
+            k += 1
+        return k
+
+    def render(self, scale: float, viewport: Tuple[int, int, int, int],
+               resample: int = Image.Resampling.BILINEAR) -> Optional[Image.Image]:
+        """
+        渲染可见视口
+        viewport 为显示坐标下的 (x, y, 宽, 高)，即原图缩放 scale 后的像素坐标；
+        返回视口大小的图像（视口与图像不相交时返回None）
+        """
+        x, y, w, h = viewport
+        display_w, display_h = self.width * scale, self.height * scale
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(display_w, x + w), min(display_h, y + h)
+        out_w, out_h = int(round(x1 - x0)), int(round(y1 - y0))
+        if out_w <= 0 or out_h <= 0:
+            return None
+
+        k = self.level_for(scale)
+        image = self.level(k)
+        # 显示坐标 -> 层级坐标
+        factor = image.width / display_w
+        box = (x0 * factor, y0 * factor,
+               min(image.width, x1 * factor), min(image.height, y1 * factor))
+        return image.resize((out_w, out_h), resample, box=box)
@@ -0,0 +1,169 @@
+"""
+GUI后台任务
+加载、解密和保存在单个后台线程中顺序执行（解密器不是线程安全的），
+结果放入队列，由Tk主线程通过 after() 轮询取回并回调，界面不会卡住。
+正在运行的任务被取消后，变换在下一带开始前结束（见 core.lut.cancellable），
+取代它的新任务不必等待整个解密完成
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+from core.lut import DecodeCancelled, cancellable
+
+
+class Job:
+    """一个后台任务；取消后正在运行的变换尽快结束，已得到的结果也会被丢弃"""
+
+    def __init__(self, kind: str, description: str,
+                 on_done: Optional[Callable] = None, on_error: Optional[Callable] = None):
+        self.kind = kind
+        self.description = description
+        self.on_done = on_done
+        self.on_error = on_error
+        self.started = time.perf_counter()
+        self.future: Optional[Future] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class BackgroundWorker:
+    """
+    后台任务执行器
+    - submit 提交的新任务默认取消同类（及 supersedes 指定类别）的旧任务，
+      快速连续操作时不会积压无用的计算
+    - on_state(job 或 None) 在活动任务变化时于主线程调用，用于更新进度显示
+    """
+
+    def __init__(self, root, on_state: Optional[Callable] = None, poll_ms: int = 50):
+        self.root = root
+        self.on_state = on_state
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gui-worker')
+        self._results: "queue.Queue" = queue.Queue()
+        self._active: List[Job] = []
+        self._polling = False
+
+    def submit(self, kind: str, func: Callable, *args, description: str = '',
+               on_done: Optional[Callable] = None, on_error: Optional[Callable] = None,
+               supersedes: Optional[Sequence[str]] = ()) -> Job:
+        """
+        提交任务；on_done(结果) / on_error(异常) 在主线程中调用
+        supersedes 为同时取消的其他类别；为None时不取消任何任务（包括同类）
+        """
+        if supersedes is not None:
+            self.cancel((kind,) + tuple(supersedes))
+        job = Job(kind, description, on_done, on_error)
+        job.future = self._executor.submit(self._run, job, func, args)
+        return self._track(job)
+
+    def watch(self, kind: str, future: Future, description: str = '',
+              on_done: Optional[Callable] = None, on_error: Optional[Callable] = None) -> Job:
+        """
+        跟踪在其他线程（如写出线程）中执行的 Future，完成后同样在主线程回调；
+        不取消其他任务
+        """
+        job = Job(kind, description, on_done, on_error)
+        job.future = future
+        future.add_done_callback(lambda f: self._finished(job, f))
+        return self._track(job)
+
+    def _track(self, job: Job) -> Job:
+        self._active.append(job)
+        self._notify()
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+        return job
+
+    def _finished(self, job: Job, future: Future):
+        """外部 Future 完成（在其执行线程中调用）"""
+        if future.cancelled():
+            self._results.put((job, None, None))
+        elif future.exception() is not None:
+            self._results.put((job, None, future.exception()))
+        else:
+            self._results.put((job, future.result(), None))
+
+    def _run(self, job: Job, func: Callable, args: tuple):
+        """在后台线程中执行；已取消的任务不再运行，运行中被取消时在分带之间结束"""
+        if job.cancelled:
+            self._results.put((job, None, None))
+            return None
+        try:
+            with cancellable(lambda: job.cancelled):
+                result = func(*args)
+        except DecodeCancelled:
+            self._results.put((job, None, None))
+            return None
+        except Exception as e:
+            self._results.put((job, None, e))
+            return None
+        self._results.put((job, result, None))
+        # 同时作为 Future 的结果，供之后的任务取用（如解密取用加载任务得到的解密器）
+        return result
+
+    def _poll(self):
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if job in self._active:
+                self._active.remove(job)
+            if job.cancelled:
+                continue
+            if error is not None:
+                if job.on_error:
+                    job.on_error(error)
+            elif job.on_done:
+                job.on_done(result)
+
+        # 排队中即被取消的任务不会产生结果
+        self._active = [job for job in self._active if not job.future.cancelled()]
+        self._notify()
+        if self._active:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _notify(self):
+        if self.on_state:
+            self.on_state(self.current)
+
+    @property
+    def current(self) -> Optional[Job]:
+        """当前未取消的最早任务（用于进度显示）"""
+        for job in self._active:
+            if not job.cancelled:
+                return job
+        return None
+
+    def has(self, kind: str) -> bool:
+        return any(job.kind == kind and not job.cancelled for job in self._active)
+
+    def cancel(self, kinds: Optional[Sequence[str]] = None):
+        """取消指定类别（默认全部）的任务"""
+        for job in self._active:
+            if kinds is None or job.kind in kinds:
+                job.cancel()
+        self._notify()
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
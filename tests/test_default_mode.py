@@ -0,0 +1,129 @@
+"""
+默认模式（色阶映射）查找表内核与原 float32 实现的逐位一致性测试
+运行: python -m pytest -q
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from core.decoder import ImageDecoder
+from core.lut import apply_default_mode
+
+# 覆盖端点和中间值的边界与亮度
+BOUNDARIES = [0, 1, 2, 63, 127, 128, 129, 200, 253, 254, 255]
+BRIGHTNESSES = [0, 1, 55, 128, 254, 255]
+MODE_TYPES = ['dark', 'light']
+
+
+def reference_default_mode(img_array: np.ndarray, mode_type: str, k: int, l: int) -> np.ndarray:
+    """原 float32 实现（逐项构建查找表，按通道 clip 后查表），作为对照"""
+    img_array = img_array.astype(np.float32)
+    lut = np.zeros(256, dtype=np.float32)
+    for x in range(256):
+        if mode_type == 'dark':
+            if x <= k:
+                lut[x] = x * 255.0 / k if k > 0 else 0
+            else:
+                lut[x] = k
+        else:
+            if x < k:
+                lut[x] = l
+            else:
+                lut[x] = (x - k) * 255.0 / (255 - k) if k < 255 else 255
+
+    if len(img_array.shape) == 3:
+        result = np.zeros_like(img_array)
+        for c in range(3):
+            channel = np.clip(img_array[:, :, c].astype(np.int32), 0, 255)
+            result[:, :, c] = lut[channel]
+    else:
+        result = lut[np.clip(img_array.astype(np.int32), 0, 255)]
+    return result.astype(np.uint8)
+
+
+def _levels(channels: int = 0, seed: int = 0) -> np.ndarray:
+    """包含全部256个色阶的测试数据（每个通道的色阶顺序不同）"""
+    rng = np.random.default_rng(seed)
+    ramp = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    if not channels:
+        return ramp
+    return np.stack([rng.permutation(ramp.ravel()).reshape(16, 16) for _ in range(channels)],
+                    axis=-1)
+
+
+def _images():
+    rgba = _levels(4, seed=1)
+    palette = Image.frombytes('P', (16, 16), _levels().tobytes())
+    palette.putpalette(_levels(3, seed=2).reshape(-1).tolist())
+    deep = (_levels().astype(np.uint16) << 8) | _levels(1, seed=3)[:, :, 0]
+    return {
+        'L': Image.fromarray(_levels(), 'L'),
+        'RGB': Image.fromarray(_levels(3), 'RGB'),
+        'RGBA': Image.fromarray(rgba, 'RGBA'),
+        'P': palette,
+        'I;16': Image.fromarray(deep),
+    }
+
+
+IMAGES = _images()
+
+
+@pytest.mark.parametrize('mode_type', MODE_TYPES)
+@pytest.mark.parametrize('boundary', BOUNDARIES)
+@pytest.mark.parametrize('brightness', BRIGHTNESSES)
+@pytest.mark.parametrize('image_mode', ['L', 'RGB', 'P'])
+def test_matches_float32(image_mode, mode_type, boundary, brightness):
+    # P 图像的数组为调色板索引，与原实现同样直接对索引查表
+    img_array = np.asarray(IMAGES[image_mode])
+    expected = reference_default_mode(img_array, mode_type, boundary, brightness)
+    result = apply_default_mode(img_array, mode_type, boundary, brightness)
+    assert result.dtype == np.uint8
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('mode_type', MODE_TYPES)
+@pytest.mark.parametrize('boundary', BOUNDARIES)
+@pytest.mark.parametrize('brightness', BRIGHTNESSES)
+def test_rgba_color_matches_float32(mode_type, boundary, brightness):
+    # 颜色通道与原实现一致；alpha 原样透传（原实现置零）
+    img_array = np.asarray(IMAGES['RGBA'])
+    expected = reference_default_mode(img_array, mode_type, boundary, brightness)
+    result = apply_default_mode(img_array, mode_type, boundary, brightness, alpha=True)
+    np.testing.assert_array_equal(result[:, :, :3], expected[:, :, :3])
+    np.testing.assert_array_equal(result[:, :, 3], img_array[:, :, 3])
+
+
+@pytest.mark.parametrize('mode_type', MODE_TYPES)
+@pytest.mark.parametrize('boundary', BOUNDARIES)
+@pytest.mark.parametrize('brightness', BRIGHTNESSES)
+def test_16bit_matches_float32_on_high_byte(mode_type, boundary, brightness):
+    # 16位数据按高8位（色阶）查表，结果与原实现作用于高字节时一致
+    img_array = np.asarray(IMAGES['I;16'])
+    assert img_array.dtype.itemsize == 2
+    expected = reference_default_mode(img_array >> 8, mode_type, boundary, brightness)
+    result = apply_default_mode(img_array, mode_type, boundary, brightness)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_out_buffer():
+    img_array = np.asarray(IMAGES['RGB'])
+    out = np.empty_like(img_array)
+    result = apply_default_mode(img_array, 'light', 100, 55, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, reference_default_mode(img_array, 'light', 100, 55))
+
+
+@pytest.mark.parametrize('image_mode', ['L', 'RGB'])
+@pytest.mark.parametrize('mode_type', MODE_TYPES)
+@pytest.mark.parametrize('brightness', [55, 200])
+def test_decoder_matches_float32(image_mode, mode_type, brightness):
+    buffer = io.BytesIO()
+    IMAGES[image_mode].save(buffer, format='PNG')
+    decoder = ImageDecoder()
+    assert decoder.load_image(io.BytesIO(buffer.getvalue()))
+    result = decoder.decrypt_default_mode(mode_type, 128, brightness=brightness)
+    expected = reference_default_mode(np.asarray(IMAGES[image_mode]), mode_type, 128, brightness)
+    np.testing.assert_array_equal(np.asarray(result), expected)
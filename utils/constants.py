@@ -31,4 +31,14 @@ DEFAULT_BOUNDARY = 128
 DEFAULT_BRIGHTNESS = 55
 DEFAULT_RESOLUTION = 0.5
 DEFAULT_LSB_BITS = 2
-DEFAULT_CHANNEL_BITS = [3, 4, 5]  # R, G, B
\ No newline at end of file
+DEFAULT_CHANNEL_BITS = [3, 4, 5]  # R, G, B
+
+# 解密结果缓存上限（字节）
+RESULT_CACHE_BYTES = 512 * 1024 * 1024
+
+# 手动模式实时预览：参数变化的合并间隔（毫秒）、画布尺寸未知时的代理图尺寸
+PREVIEW_DEBOUNCE_MS = 30
+PREVIEW_MAX_SIZE = (800, 800)
+
+# 保存PNG的默认压缩级别（1 比PIL默认的 6 快数倍，体积相近）
+DEFAULT_PNG_LEVEL = 1